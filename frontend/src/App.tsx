@@ -3,6 +3,7 @@ import Phaser from 'phaser'
 import BattleScene from './scenes/BattleScene'
 import MainMenuScene from './scenes/MainMenuScene'
 import CompleteGameScene from './scenes/CompleteGameScene'
+import { AssetLoader } from './game/AssetLoader'
 import './App.css'
 
 declare global {
@@ -32,8 +33,12 @@ export default function App() {
     const game = new Phaser.Game(config)
     window.game = game
     game.scene.start('MainMenuScene')
+    const stopHotReload = AssetLoader.enableHotReload(game)
 
-    return () => { game.destroy(true) }
+    return () => {
+      stopHotReload()
+      game.destroy(true)
+    }
   }, [])
 
   return <div className="vityaz-container"><div ref={containerRef} className="game-container" /></div>
@@ -1,6 +1,54 @@
 import Phaser from 'phaser';
 
 export class AssetLoader {
+  /**
+   * Dev server only: swap textures in place when `graphics-generator.py --watch`
+   * rewrites their files, so the running game shows the new art without a reload.
+   * Changed JSON (atlas frames, maps) still needs a full page reload.
+   * Returns a function that stops listening.
+   */
+  static enableHotReload(game: Phaser.Game): () => void {
+    let active = true;
+    const handler = ({ changed }: { changed: string[] }) => {
+      if (changed.some((path) => path.endsWith('.json'))) {
+        window.location.reload();
+        return;
+      }
+
+      const files = new Set(changed.map((path) => `/assets/${path}`));
+      const stamp = Date.now();
+      for (const key of game.textures.getTextureKeys()) {
+        const texture = game.textures.get(key);
+        for (const source of texture.source) {
+          if (!(source.image instanceof HTMLImageElement)) continue;
+          const path = new URL(source.image.src, window.location.href).pathname;
+          if (!files.has(path)) continue;
+
+          const image = new Image();
+          image.onload = () => {
+            if (!active) return;
+            if (game.renderer instanceof Phaser.Renderer.WebGL.WebGLRenderer && source.glTexture) {
+              game.renderer.deleteTexture(source.glTexture);
+            }
+            source.image = image;
+            source.init(game);
+            // Frames keep their own reference to the GL texture
+            for (const frame of Object.values(texture.frames) as Phaser.Textures.Frame[]) {
+              if (frame.source === source) frame.glTexture = source.glTexture;
+            }
+          };
+          image.src = `${path}?v=${stamp}`;
+        }
+      }
+    };
+    import.meta.hot?.on('vityaz:assets', handler);
+    return () => {
+      // Images already in flight check `active` before swapping
+      active = false;
+      import.meta.hot?.off('vityaz:assets', handler);
+    };
+  }
+
   static preload(scene: Phaser.Scene) {
     // Player sprites
     scene.load.image('player', '/assets/sprites/player.png');
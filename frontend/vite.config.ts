@@ -1,8 +1,37 @@
-import { defineConfig } from 'vite'
+import { defineConfig, type Plugin } from 'vite'
 import react from '@vitejs/plugin-react'
 
+// Relays asset rebuilds from `tools/graphics-generator.py --watch` to the
+// game over Vite's HMR socket (see AssetLoader.enableHotReload)
+function vityazAssets(): Plugin {
+  return {
+    name: 'vityaz-assets',
+    apply: 'serve',
+    configureServer(server) {
+      server.middlewares.use('/__vityaz/assets', (req, res) => {
+        if (req.method !== 'POST') {
+          res.statusCode = 405
+          res.end()
+          return
+        }
+        let body = ''
+        req.on('data', (chunk) => { body += chunk })
+        req.on('end', () => {
+          try {
+            server.ws.send({ type: 'custom', event: 'vityaz:assets', data: JSON.parse(body) })
+            res.statusCode = 204
+          } catch {
+            res.statusCode = 400
+          }
+          res.end()
+        })
+      })
+    },
+  }
+}
+
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), vityazAssets()],
   server: {
     port: 3000,
     strictPort: false,
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+VITYAZ Asset Common
+Shared by graphics-generator.py, generate_sprites.py, graphics-benchmark.py
+and asset_manifest.py
+
+- ColorPalette: the official game colours
+- Lossless encoders: optimized PNG, indexed PNG on the shared palette, WebP
+- write_atomic / write_if_changed: file writes readers never see half-done
+- load_generator_module: import graphics-generator.py, whose file name is not
+  a valid module name
+"""
+
+import io
+import os
+import sys
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+TOOLS_DIR = Path(__file__).resolve().parent
+GENERATOR_PATH = TOOLS_DIR / "graphics-generator.py"
+
+
+class ColorPalette:
+    """VITYAZ official color palette"""
+    KRAPOVY_MAROON = (139, 21, 56)      # #8B1538
+    MILITARY_GREEN = (61, 74, 61)       # #3D4A3D
+    TACTICAL_BLACK = (26, 26, 26)       # #1A1A1A
+    GOLD_ACCENT = (212, 175, 55)        # #D4AF37
+    WHITE = (255, 255, 255)
+    DARK_GRAY = (90, 90, 90)
+    LIGHT_GRAY = (200, 200, 200)
+    RED = (192, 21, 47)
+    GREEN = (34, 197, 94)
+    BLUE = (59, 130, 246)
+
+    @classmethod
+    def values(cls) -> Dict[str, Tuple[int, int, int]]:
+        """All palette colours by name"""
+        return {name: value for name, value in vars(cls).items() if name.isupper()}
+
+
+def encode_png(image: Image.Image) -> bytes:
+    """Encode image as an optimized PNG (zlib level 9, best filter per image)"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def encode_webp(image: Image.Image) -> bytes:
+    """
+    Encode image as lossless WebP (colour under fully transparent pixels may change)
+
+    Effort 4 of 6: method=6 is ~50x slower for a few percent smaller files.
+    """
+    buffer = io.BytesIO()
+    image.convert('RGBA').save(buffer, format='WEBP', lossless=True, quality=100, method=4)
+    return buffer.getvalue()
+
+
+def shared_palette() -> List[Tuple[int, int, int, int]]:
+    """RGBA palette prefix shared by every indexed PNG: transparent, then ColorPalette"""
+    return [(0, 0, 0, 0)] + [color + (255,) for color in ColorPalette.values().values()]
+
+
+def quantize_indexed(image: Image.Image, max_colors: int = 256) -> Optional[Image.Image]:
+    """
+    Convert an image to palette mode if it uses few enough colours
+
+    The palette starts with shared_palette() so common colours keep the same
+    index in every asset; colours not in it are appended in sorted order.
+    Fully transparent pixels collapse to index 0. Alpha goes into tRNS.
+
+    Args:
+        image: Source image
+        max_colors: Palette size limit
+
+    Returns:
+        'P' mode image with a transparency table, or None if it does not fit
+    """
+    rgba = np.array(image.convert('RGBA'))
+    rgba[rgba[..., 3] == 0] = 0
+    packed = rgba.view('<u4')[..., 0]
+    colors, inverse = np.unique(packed, return_inverse=True)
+
+    shared = np.array(shared_palette(), dtype=np.uint8).view('<u4')[:, 0]
+    extra = np.setdiff1d(colors, shared)
+    if len(shared) + len(extra) > max_colors:
+        return None
+
+    palette = np.concatenate([shared, extra])
+    order = np.argsort(palette)
+    lookup = order[np.searchsorted(palette[order], colors)]
+    indices = lookup[inverse.reshape(packed.shape)].astype(np.uint8)
+
+    entries = palette.view(np.uint8).reshape(-1, 4)
+    indexed = Image.fromarray(indices, 'P')
+    indexed.putpalette(entries[:, :3].tobytes())
+    alpha = entries[:, 3]
+    translucent = np.nonzero(alpha < 255)[0]
+    if len(translucent):
+        indexed.info['transparency'] = alpha[:translucent[-1] + 1].tobytes()
+    return indexed
+
+
+def write_atomic(path: Path, data: bytes):
+    """Write bytes via a temporary file so readers never see a partial file"""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Write bytes unless the file already holds them; returns True if written"""
+    path = Path(path)
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, data)
+    return True
+
+
+def load_generator_module() -> ModuleType:
+    """
+    Import a fresh copy of graphics-generator.py as 'graphics_generator'
+
+    Each call executes the file again, so --watch picks up edits; the module
+    is registered in sys.modules so pickling its classes works in forked
+    pool workers.
+    """
+    spec = importlib.util.spec_from_file_location("graphics_generator", GENERATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
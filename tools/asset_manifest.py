@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+VITYAZ Asset Manifest
+Shared by graphics-generator.py and generate_sprites.py
+
+Scans an output directory and records in manifest.json, for every asset that
+actually exists:
+- Dimensions and @Nx scale (images)
+- Byte size and SHA-256 (plus a ?v= URL for long-lived immutable caching)
+- Frame layout (atlas JSON, spritesheet strips, animated images)
+- Encoding: format, and for PNGs the smaller lossless WebP next to them
+- Aliases: later byte-identical files name the first copy
+
+The manifest holds only content-derived fields, so identical builds give an
+identical file. Size and mtime stamps live in a cache file under
+.cache/asset-manifest/; entries whose stamp is unchanged are reused, so
+updates only re-read files that changed.
+
+Usage: python3 asset_manifest.py <output_dir> [...] [--cache-dir DIR]
+Example: python3 tools/asset_manifest.py frontend/public/assets
+"""
+
+import io
+import re
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from asset_common import write_if_changed
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+ASSET_SUFFIXES = ('.png', '.webp', '.jpg', '.jpeg', '.gif', '.json')
+# Tool bookkeeping, not game assets
+SKIP_NAMES = {MANIFEST_NAME, "generation_manifest.json"}
+SCALE_SUFFIX = re.compile(r"@(\d+)x$")
+STAT_CACHE_DIR = ".cache/asset-manifest"
+
+
+def atlas_layout(document: Any) -> Optional[Dict[str, Any]]:
+    """Frame layout of a Phaser atlas JSON (hash or multiatlas), or None"""
+    if not isinstance(document, dict):
+        return None
+    if isinstance(document.get("textures"), list):
+        pages = [(texture.get("image"), len(texture.get("frames", [])))
+                 for texture in document["textures"]]
+    elif isinstance(document.get("frames"), dict) and "meta" in document:
+        pages = [(document["meta"].get("image"), len(document["frames"]))]
+    else:
+        return None
+    return {
+        "type": "atlas",
+        "count": sum(count for _, count in pages),
+        "images": [image for image, _ in pages if image],
+    }
+
+
+def scan_asset(path: Path) -> Dict[str, Any]:
+    """
+    Read one asset and describe it
+
+    Args:
+        path: Asset file
+
+    Returns:
+        Entry with bytes, sha256 and, where known, width/height/scale/frames
+    """
+    data = path.read_bytes()
+    entry: Dict[str, Any] = {"bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+    if path.suffix.lower() == '.json':
+        try:
+            layout = atlas_layout(json.loads(data))
+        except ValueError:
+            layout = None
+        if layout:
+            entry["frames"] = layout
+    else:
+        with Image.open(io.BytesIO(data)) as image:
+            entry["width"], entry["height"] = image.size
+            entry["format"] = "png-indexed" if image.format == "PNG" and image.mode == "P" else image.format.lower()
+            count = getattr(image, "n_frames", 1)
+            if count > 1:
+                entry["frames"] = {"type": "animation", "count": count}
+
+    match = SCALE_SUFFIX.search(path.stem)
+    if match:
+        entry["scale"] = int(match.group(1))
+    return entry
+
+
+def load_manifest(root: Path, name: str = MANIFEST_NAME) -> Dict[str, Any]:
+    """Existing manifest under root, or an empty one"""
+    try:
+        with open(Path(root) / name) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "assets": {}}
+
+
+def stat_cache_path(root: Path, cache_dir: str) -> Path:
+    """File of size/mtime stamps for one output directory"""
+    digest = hashlib.sha256(str(Path(root).resolve()).encode()).hexdigest()[:16]
+    return Path(cache_dir) / f"stats-{digest}.json"
+
+
+def update_manifest(root: str, layouts: Optional[Dict[str, Dict[str, Any]]] = None,
+                    name: str = MANIFEST_NAME,
+                    cache_dir: Optional[str] = STAT_CACHE_DIR) -> Tuple[Path, Dict[str, int]]:
+    """
+    Rebuild root/manifest.json from the files under root
+
+    Files that disappeared drop out; unchanged files (same size and mtime as
+    stamped in cache_dir) keep their previous entry without being read again.
+
+    Args:
+        root: Output directory to scan
+        layouts: Frame layouts by relative path for assets whose layout cannot
+            be read from the file (e.g. spritesheet strips)
+        name: Manifest file name
+        cache_dir: Directory for the stat cache, or None to read every file
+
+    Returns:
+        (manifest path, {"assets", "scanned", "reused"})
+    """
+    root = Path(root)
+    previous = load_manifest(root, name)["assets"]
+    stats_path = stat_cache_path(root, cache_dir) if cache_dir else None
+    try:
+        stamps = json.loads(stats_path.read_text()) if stats_path else {}
+    except (OSError, ValueError):
+        stamps = {}
+    new_stamps: Dict[str, Any] = {}
+    layouts = layouts or {}
+    assets: Dict[str, Dict[str, Any]] = {}
+    stats = {"assets": 0, "scanned": 0, "reused": 0}
+
+    for path in sorted(root.rglob("*")):
+        relative = path.relative_to(root)
+        if (not path.is_file() or path.suffix.lower() not in ASSET_SUFFIXES
+                or path.name in SKIP_NAMES or any(part.startswith('.') for part in relative.parts)):
+            continue
+        key = relative.as_posix()
+        stat = path.stat()
+        entry = previous.get(key)
+        if entry and stamps.get(key) == [stat.st_size, stat.st_mtime_ns, entry.get("sha256")]:
+            stats["reused"] += 1
+        else:
+            entry = scan_asset(path)
+            stats["scanned"] += 1
+        new_stamps[key] = [stat.st_size, stat.st_mtime_ns, entry["sha256"]]
+        if key in layouts:
+            entry["frames"] = layouts[key]
+        elif "frames" not in entry and previous.get(key, {}).get("frames", {}).get("type") == "grid":
+            # Grid layouts are not in the file; keep them when rescanned without layouts
+            entry["frames"] = previous[key]["frames"]
+        entry["url"] = f"{key}?v={entry['sha256'][:12]}"
+        entry.pop("atlas", None)
+        entry.pop("alias", None)
+        entry.pop("webp", None)
+        assets[key] = entry
+
+    # PNGs with a smaller lossless WebP next to them (see ALTERNATE_FORMATS)
+    for key, entry in assets.items():
+        sibling = key[:-len(".png")] + ".webp" if key.endswith(".png") else None
+        if sibling in assets and assets[sibling]["bytes"] < entry["bytes"]:
+            entry["webp"] = sibling
+
+    # Byte-identical files point at the first copy so loaders fetch it once
+    first: Dict[str, str] = {}
+    for key, entry in assets.items():
+        original = first.setdefault(entry["sha256"], key)
+        if original != key:
+            entry["alias"] = original
+
+    # Point atlas page images back at the JSON describing their frames
+    for key, entry in assets.items():
+        for image in entry.get("frames", {}).get("images", []):
+            page = (PurePosixPath(key).parent / image).as_posix()
+            if page in assets:
+                assets[page]["atlas"] = key
+
+    stats["assets"] = len(assets)
+    manifest_path = root / name
+    write_if_changed(manifest_path, (json.dumps({"version": MANIFEST_VERSION, "assets": assets},
+                                            indent=2, sort_keys=True) + "\n").encode())
+    if stats_path:
+        write_if_changed(stats_path, json.dumps(new_stamps, sort_keys=True).encode())
+    return manifest_path, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VITYAZ Asset Manifest")
+    parser.add_argument(
+        'roots',
+        nargs='+',
+        help='Output directories to (re)index'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=STAT_CACHE_DIR,
+        help='Directory for the size/mtime stat cache'
+    )
+    args = parser.parse_args()
+
+    for root in args.roots:
+        if not Path(root).is_dir():
+            print(f"❌ Not a directory: {root}")
+            sys.exit(1)
+        manifest_path, stats = update_manifest(root, cache_dir=args.cache_dir)
+        print(f"📋 {manifest_path}: {stats['assets']} assets "
+              f"({stats['scanned']} scanned, {stats['reused']} unchanged)")
+
+
+if __name__ == '__main__':
+    main()
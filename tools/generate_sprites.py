@@ -4,34 +4,641 @@ AI Sprite Generator для VITYAZ: Special Operations
 Генерирует профессиональные спрайты через Stable Diffusion
 
 Usage:
-    python3 generate_sprites.py
+    python3 generate_sprites.py [--max-batch-size N] [--stand-in]
+    python3 generate_sprites.py --serve              # тёплый воркер с загруженной моделью
+    python3 generate_sprites.py --client --only weapons/svd
 
 Requirements:
-    pip install torch diffusers transformers accelerate pillow
+    pip install torch diffusers transformers accelerate pillow numpy
 """
 
 import os
 import sys
+import argparse
+import json
+import math
+import time
+import zlib
+import pickle
+import socket
+import hashlib
+import ipaddress
+import threading
+import functools
+import contextlib
+import collections
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Нет в Windows
+    resource = None
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 try:
-    import torch
-    from diffusers import StableDiffusionPipeline
-    from PIL import Image
+    import numpy as np
+    from PIL import Image, ImageDraw
 except ImportError:
     print("❌ Требуется установка зависимостей:")
-    print("   pip install torch diffusers transformers accelerate pillow")
+    print("   pip install pillow numpy")
     sys.exit(1)
 
+from asset_common import ColorPalette, encode_png, encode_webp, quantize_indexed
+from asset_manifest import update_manifest
+
+# torch/diffusers нужны только для настоящей модели и импортируются лениво
+# (load_diffusers): клиенту воркера и --stand-in они не нужны
+torch = None
+StableDiffusionPipeline = None
+
+DEFAULT_WORKER_ADDRESS = ".cache/sprite-worker.sock"
+DEFAULT_STEPS = 50
+DEFAULT_GUIDANCE = 7.5
+
+# Профили памяти от самого быстрого к самому экономному (для --memory-budget)
+MEMORY_PROFILES = (
+    (),
+    ("attention_slicing",),
+    ("attention_slicing", "vae_slicing"),
+    ("attention_slicing", "vae_slicing", "vae_tiling"),
+)
+CALIBRATION_STEPS = 2
+
+# Оценка кандидатов (--candidates): веса метрик и пороги
+SCORE_WEIGHTS = {"sharpness": 0.3, "palette": 0.2, "separation": 0.3, "coverage": 0.2}
+COVERAGE_RANGE = (0.15, 0.65)      # Доля силуэта, которую считаем нормальной
+BACKGROUND_TOLERANCE = 48.0         # RGB-расстояние от цвета фона до силуэта
+MAX_RGB_DISTANCE = 441.7            # sqrt(3 * 255^2)
+
+# Постобработка: прозрачный фон и привязка к палитре через 3D LUT
+KEY_TOLERANCE = 40.0                # RGB-расстояние, в пределах которого пиксель - фон
+LUT_BITS = 6                        # 64^3 ячеек: 2 младших бита канала отбрасываются
+
+# Уменьшение для пиксель-арта (ключ "resample" в промпте)
+RESAMPLE_MODES = ("lanczos", "mode", "edge")
+MAX_BLOCK_SAMPLES = 8               # Выборок на ось в блоке исходных пикселей
+VOTE_BITS = 5                       # Точность цвета при голосовании в режиме mode
+EDGE_THRESHOLD = 48.0               # Перепад яркости, с которого блок считается краем
+
+
+def load_diffusers() -> bool:
+    """Импортировать torch и diffusers; False, если они не установлены"""
+    global torch, StableDiffusionPipeline
+    if StableDiffusionPipeline is None:
+        try:
+            import torch as torch_module
+            from diffusers import StableDiffusionPipeline as pipeline_class
+        except ImportError:
+            return False
+        torch, StableDiffusionPipeline = torch_module, pipeline_class
+    return True
+
+
+def normalize_prompt(text: str) -> str:
+    """Схлопнуть переносы и отступы многострочных промптов"""
+    return " ".join(text.split())
+
+
+class PromptEmbeddingCache:
+    """
+    Дисковый кэш эмбеддингов текстового энкодера (CLIP)
+    
+    Ключ - нормализованный текст промпта + id модели. Размер ограничен
+    max_bytes; при переполнении удаляются давно не использованные записи.
+    Индекс пишется при каждой записи, а при загрузке сверяется с папкой,
+    так что файлы прерванного запуска тоже учитываются.
+    """
+    
+    def __init__(self, cache_dir: str = ".cache/sprite-embeddings", model_id: str = "",
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self.index_path = self.cache_dir / "index.json"
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            self.index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+        self.sync_index()
+    
+    def sync_index(self):
+        """Привести индекс к файлам: чужие .pkl - в индекс по mtime, пропавшие - из индекса"""
+        on_disk = {path.stem: path for path in self.cache_dir.glob("*.pkl")}
+        for key in set(self.index) - set(on_disk):
+            del self.index[key]
+        for key in set(on_disk) - set(self.index):
+            stat = on_disk[key].stat()
+            self.index[key] = {"bytes": stat.st_size, "used": stat.st_mtime}
+    
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\n{normalize_prompt(text)}".encode()).hexdigest()
+    
+    def get(self, text: str) -> Optional[Any]:
+        """Эмбеддинг для текста или None"""
+        key = self.key(text)
+        entry = self.index.get(key)
+        if entry is not None:
+            try:
+                with open(self.cache_dir / f"{key}.pkl", 'rb') as f:
+                    embeds = pickle.load(f)
+                entry["used"] = time.time()
+                self.hits += 1
+                return embeds
+            except (OSError, pickle.UnpicklingError, EOFError):
+                del self.index[key]
+        self.misses += 1
+        return None
+    
+    def put(self, text: str, embeds: Any):
+        """Сохранить эмбеддинг (на CPU) и вытеснить старые записи сверх лимита"""
+        key = self.key(text)
+        if hasattr(embeds, "cpu"):
+            embeds = embeds.cpu()
+        data = pickle.dumps(embeds, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self.cache_dir / f"{key}.pkl"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self.index[key] = {"bytes": len(data), "used": time.time()}
+        self.save()
+    
+    def evict(self):
+        """LRU: удалять записи, пока суммарный размер больше max_bytes"""
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["bytes"]
+            (self.cache_dir / f"{key}.pkl").unlink(missing_ok=True)
+    
+    def save(self):
+        """Вытеснить лишнее и атомарно записать индекс"""
+        self.evict()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.index, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.index_path)
+
+
+def parse_size_mb(text: str) -> int:
+    """'6G', '6GB', '6000M' или '6000' (МБ) → мегабайты"""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def reset_peak_rss() -> bool:
+    """Сбросить пик RSS процесса (Linux: VmHWM через clear_refs); False, если нельзя"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Пик RSS процесса с последнего сброса (или с запуска) в МБ"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - КБ
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def sprite_seed(name: str) -> int:
+    """Фиксированный seed спрайта из его имени (crc32)"""
+    return zlib.crc32(name.encode())
+
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+class GenerationManifest:
+    """
+    Манифест генерации: параметры и хэш результата каждого спрайта
+    
+    Спрайт актуален, если параметры совпадают, а файл на диске имеет
+    записанный хэш. Манифест сохраняется после каждого спрайта, поэтому
+    прерванный запуск продолжается с места остановки.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.load()
+    
+    def load(self):
+        try:
+            self.sprites = json.loads(self.path.read_text()).get("sprites", {})
+        except (OSError, ValueError):
+            self.sprites = {}
+    
+    def is_current(self, name: str, params: dict, output_path: Path) -> bool:
+        entry = self.sprites.get(name)
+        if entry is None or entry["params"] != params or not output_path.exists():
+            return False
+        return file_sha256(output_path) == entry["sha256"]
+    
+    def record(self, name: str, params: dict, output_path: Path, extra: Optional[dict] = None):
+        self.sprites[name] = {
+            "params": params,
+            "output": output_path.relative_to(self.path.parent).as_posix(),
+            "sha256": file_sha256(output_path),
+            **(extra or {}),
+        }
+        self.save()
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": 1, "sprites": self.sprites}, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+
+# ==================== ОЦЕНКА КАНДИДАТОВ ====================
+
+def game_palette() -> np.ndarray:
+    """Официальная палитра игры (ColorPalette) как массив (P, 3)"""
+    return np.array(list(ColorPalette.values().values()), dtype=np.float32)
+
+
+def score_candidates(pixels: np.ndarray, palette: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Оценить кандидатов одного спрайта, уже уменьшенных до целевого размера
+    
+    Все метрики в диапазоне 0..1 (больше - лучше) и считаются сразу для всех
+    кандидатов:
+    - sharpness: средний перепад яркости между соседними пикселями
+    - palette: близость пикселей силуэта к палитре игры
+    - separation: насколько силуэт отличается от фона сильнее, чем фон от себя
+    - coverage: доля силуэта в пределах COVERAGE_RANGE
+    
+    Args:
+        pixels: (K, H, W, 3) uint8
+        palette: (P, 3) цвета палитры
+    
+    Returns:
+        {metric: (K,)} плюс "total" - взвешенная сумма по SCORE_WEIGHTS
+    """
+    pixels = pixels.astype(np.float32)
+    luma = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gradient = (np.abs(np.diff(luma, axis=1)).mean(axis=(1, 2))
+                + np.abs(np.diff(luma, axis=2)).mean(axis=(1, 2)))
+    
+    # Фон - медианный цвет рамки шириной в пиксель
+    border = np.concatenate(
+        [pixels[:, 0], pixels[:, -1], pixels[:, 1:-1, 0], pixels[:, 1:-1, -1]], axis=1
+    )
+    background = np.median(border, axis=1)
+    distance = np.linalg.norm(pixels - background[:, None, None], axis=-1)
+    foreground = distance > BACKGROUND_TOLERANCE
+    area = foreground.sum(axis=(1, 2))
+    fraction = area / foreground[0].size
+    
+    border_spread = np.linalg.norm(border - background[:, None], axis=-1).mean(axis=1)
+    foreground_distance = (distance * foreground).sum(axis=(1, 2)) / np.maximum(area, 1)
+    
+    nearest = np.linalg.norm(pixels[..., None, :] - palette, axis=-1).min(axis=-1)
+    palette_distance = np.where(
+        area > 0, (nearest * foreground).sum(axis=(1, 2)) / np.maximum(area, 1), nearest.mean(axis=(1, 2))
+    )
+    
+    low, high = COVERAGE_RANGE
+    scores = {
+        "sharpness": np.clip(gradient / 32, 0, 1),
+        "palette": 1 - palette_distance / MAX_RGB_DISTANCE,
+        "separation": np.clip((foreground_distance - border_spread) / 255, 0, 1) * (area > 0),
+        "coverage": 1 - np.clip(np.maximum(low - fraction, fraction - high) / 0.3, 0, 1),
+    }
+    scores["total"] = sum(weight * scores[metric] for metric, weight in SCORE_WEIGHTS.items())
+    return scores
+
+
+# ==================== ПОСТОБРАБОТКА ====================
+
+def group_indices(keys: List[Any]) -> Dict[Any, List[int]]:
+    """Индексы элементов, сгруппированные по ключу (в порядке появления)"""
+    groups: Dict[Any, List[int]] = {}
+    for index, key in enumerate(keys):
+        groups.setdefault(key, []).append(index)
+    return groups
+
+
+def block_samples(frames: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """
+    Выборки из блоков исходных пикселей под каждым пикселем результата
+    
+    Блоки не обязаны быть целыми (512 → 56): внутри каждого берётся сетка
+    до MAX_BLOCK_SAMPLES x MAX_BLOCK_SAMPLES ближайших пикселей.
+    
+    Args:
+        frames: (N, H, W, C)
+        size: (ширина, высота) результата
+    
+    Returns:
+        (N, h, w, S, C) - S выборок на пиксель результата
+    """
+    n, height, width, channels = frames.shape
+    out_width, out_height = size
+    
+    def coords(source: int, target: int) -> np.ndarray:
+        block = source / target
+        count = min(MAX_BLOCK_SAMPLES, max(1, math.ceil(block)))
+        points = np.arange(target)[:, None] * block + (np.arange(count) + 0.5) * block / count
+        return np.minimum(points.astype(np.intp), source - 1)
+    
+    ys, xs = coords(height, out_height), coords(width, out_width)
+    samples = frames[:, ys[:, None, :, None], xs[None, :, None, :]]
+    return samples.reshape(n, out_height, out_width, -1, channels)
+
+
+def mode_pool(samples: np.ndarray) -> np.ndarray:
+    """
+    Цвет большинства в каждом блоке (N, h, w, S, C) → (N, h, w, C)
+    
+    Выборки голосуют цветом, огрублённым до VOTE_BITS на канал; победитель -
+    самый длинный отрезок в отсортированных ключах. Результат - среднее
+    выборок победившего цвета, без примеси соседних цветов.
+    """
+    quantized = samples.astype(np.uint32) >> (8 - VOTE_BITS)
+    keys = sum(quantized[..., c] << (VOTE_BITS * c) for c in range(samples.shape[-1]))
+    
+    ordered = np.sort(keys, axis=-1)
+    positions = np.arange(ordered.shape[-1])
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    run_start = np.maximum.accumulate(np.where(starts, positions, 0), axis=-1)
+    longest = (positions - run_start).argmax(axis=-1)
+    winner = np.take_along_axis(ordered, longest[..., None], axis=-1)
+    
+    votes = keys == winner
+    total = (samples.astype(np.float32) * votes[..., None]).sum(axis=-2)
+    return total / votes.sum(axis=-1, keepdims=True)
+
+
+def edge_pool(samples: np.ndarray) -> np.ndarray:
+    """
+    Уменьшение с сохранением краёв (N, h, w, S, C) → (N, h, w, C)
+    
+    Ровный блок усредняется; в блоке с перепадом яркости берётся реальный
+    цвет выборки, ближайшей к медиане блока, а не смесь двух сторон края.
+    """
+    values = samples.astype(np.float32)
+    luma = values[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    flat = (luma.max(axis=-1) - luma.min(axis=-1)) < EDGE_THRESHOLD
+    
+    median = np.median(values, axis=-2)
+    nearest = np.linalg.norm(values - median[..., None, :], axis=-1).argmin(axis=-1)
+    medoid = np.take_along_axis(values, nearest[..., None, None], axis=-2)[..., 0, :]
+    return np.where(flat[..., None], values.mean(axis=-2), medoid)
+
+
+def pixel_downscale(frames: np.ndarray, size: Tuple[int, int], mode: str = "mode") -> np.ndarray:
+    """
+    Уменьшить батч кадров (изображения или кадры анимации) для пиксель-арта
+    
+    Args:
+        frames: (N, H, W, C) uint8
+        size: (ширина, высота) результата
+        mode: "mode" - цвет большинства, "edge" - с сохранением краёв
+    
+    Returns:
+        (N, h, w, C) uint8
+    """
+    pool = {"mode": mode_pool, "edge": edge_pool}[mode]
+    return np.clip(np.rint(pool(block_samples(frames, size))), 0, 255).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=8)
+def palette_lut(palette: Tuple[Tuple[int, int, int], ...], bits: int = LUT_BITS) -> np.ndarray:
+    """
+    Таблица ближайшего цвета палитры для каждой ячейки RGB-куба
+    
+    Args:
+        palette: Цвета палитры
+        bits: Бит на канал (6 → куб 64x64x64)
+    
+    Returns:
+        (2^bits, 2^bits, 2^bits) uint8 - индекс цвета палитры
+    """
+    levels = 1 << bits
+    step = 256 // levels
+    centers = np.arange(levels, dtype=np.int32) * step + step // 2
+    grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1).reshape(-1, 1, 3)
+    colors = np.array(palette, dtype=np.int32).reshape(1, -1, 3)
+    distance = ((grid - colors) ** 2).sum(axis=-1)
+    return distance.argmin(axis=-1).astype(np.uint8).reshape(levels, levels, levels)
+
+
+def snap_to_palette(pixels: np.ndarray, palette: np.ndarray, bits: int = LUT_BITS) -> np.ndarray:
+    """Заменить каждый пиксель ближайшим цветом палитры (поиск по LUT, любой батч (..., 3))"""
+    lut = palette_lut(tuple(map(tuple, palette.astype(int).tolist())), bits).ravel()
+    cells = (pixels >> (8 - bits)).astype(np.int32)
+    index = (cells[..., 0] << (2 * bits)) | (cells[..., 1] << bits) | cells[..., 2]
+    return palette.astype(np.uint8)[lut[index]]
+
+
+def key_background(pixels: np.ndarray, tolerance: float = KEY_TOLERANCE) -> np.ndarray:
+    """
+    Маска фона для батча кадров (N, H, W, 3)
+    
+    Фон - область цвета рамки (медиана), связанная с краем кадра: заливка
+    растёт от рамки шагами 4-связной дилатации сразу по всему батчу, поэтому
+    такой же цвет внутри силуэта не вырезается.
+    
+    Returns:
+        (N, H, W) bool, True - фон
+    """
+    border = np.concatenate(
+        [pixels[:, 0], pixels[:, -1], pixels[:, 1:-1, 0], pixels[:, 1:-1, -1]], axis=1
+    ).astype(np.float32)
+    background = np.median(border, axis=1)
+    similar = np.linalg.norm(pixels.astype(np.float32) - background[:, None, None], axis=-1) <= tolerance
+    
+    edge = np.zeros(similar.shape[1:], dtype=bool)
+    edge[[0, -1], :] = edge[:, [0, -1]] = True
+    filled = similar & edge
+    while True:
+        grown = filled.copy()
+        grown[:, 1:] |= filled[:, :-1]
+        grown[:, :-1] |= filled[:, 1:]
+        grown[:, :, 1:] |= filled[:, :, :-1]
+        grown[:, :, :-1] |= filled[:, :, 1:]
+        grown &= similar
+        if np.array_equal(grown, filled):
+            return filled
+        filled = grown
+
+
+def postprocess_sprites(pixels: np.ndarray, palette: np.ndarray, key: bool = True,
+                        snap: bool = True) -> np.ndarray:
+    """
+    Прозрачный фон и цвета палитры для батча уменьшенных спрайтов
+    
+    Args:
+        pixels: (N, H, W, 3) uint8
+        palette: (P, 3) цвета палитры
+        key: Сделать фон прозрачным
+        snap: Привязать цвета к палитре
+    
+    Returns:
+        (N, H, W, 4) uint8; прозрачные пиксели обнулены
+    """
+    rgb = snap_to_palette(pixels, palette) if snap else pixels
+    alpha = np.full(pixels.shape[:3], 255, dtype=np.uint8)
+    if key:
+        alpha[key_background(pixels)] = 0
+    rgba = np.concatenate([rgb, alpha[..., None]], axis=-1)
+    rgba[alpha == 0] = 0
+    return rgba
+
+
+class StandInPipeline:
+    """
+    Лёгкая локальная замена StableDiffusionPipeline для тестов
+
+    Не скачивает модель: рисует детерминированную заглушку по тексту
+    промпта. Интерфейс вызова совпадает с diffusers (батчи, .images,
+    encode_prompt/prompt_embeds).
+    """
+
+    def __init__(self):
+        self.memory_options = set()
+
+    def to(self, device):
+        return self
+
+    # Переключатели памяти как в diffusers; влияют на рабочий буфер в __call__
+    def enable_attention_slicing(self):
+        self.memory_options.add("attention_slicing")
+
+    def disable_attention_slicing(self):
+        self.memory_options.discard("attention_slicing")
+
+    def enable_vae_slicing(self):
+        self.memory_options.add("vae_slicing")
+
+    def disable_vae_slicing(self):
+        self.memory_options.discard("vae_slicing")
+
+    def enable_vae_tiling(self):
+        self.memory_options.add("vae_tiling")
+
+    def disable_vae_tiling(self):
+        self.memory_options.discard("vae_tiling")
+
+    def _working_set(self, count: int, width: int, height: int) -> np.ndarray:
+        """Буфер, имитирующий пиковую память UNet-внимания и VAE-декодера"""
+        attention = 2 if "attention_slicing" in self.memory_options else 8
+        decoded = 1 if "vae_slicing" in self.memory_options else count
+        pixels = min(width * height, 256 * 256) if "vae_tiling" in self.memory_options else width * height
+        return np.ones(count * attention * width * height + decoded * pixels * 12, dtype=np.float32)
+
+    def encode_prompt(self, prompt, device=None, num_images_per_prompt: int = 1,
+                      do_classifier_free_guidance: bool = False, negative_prompt=None, **kwargs):
+        """Псевдо-эмбеддинг (1, 77, 16) из хэша текста"""
+        def encode(text):
+            seed = int.from_bytes(hashlib.sha256(normalize_prompt(text).encode()).digest()[:8], "little")
+            return np.random.default_rng(seed).standard_normal((1, 77, 16)).astype(np.float32)
+
+        negative = encode(negative_prompt or "") if do_classifier_free_guidance else None
+        return encode(prompt), negative
+
+    def _render(self, embeds: np.ndarray, seed: int, index: int, width: int, height: int) -> Image.Image:
+        """Фигура по центру на шумном фоне; цвета и форма зависят от эмбеддинга и seed"""
+        digest = hashlib.sha256(embeds.tobytes() + f"{seed}/{index}".encode()).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+        background = rng.integers(150, 230, 3)
+        noise = rng.normal(0, 6, (height, width, 1))
+        pixels = np.clip(background + noise, 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels)
+
+        draw = ImageDraw.Draw(image)
+        for _ in range(int(rng.integers(3, 7))):
+            color = tuple(int(c) for c in rng.integers(10, 160, 3))
+            cx, cy = rng.uniform(0.35, 0.65) * width, rng.uniform(0.3, 0.7) * height
+            rx, ry = rng.uniform(0.08, 0.25) * width, rng.uniform(0.08, 0.25) * height
+            shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+            shape([(cx - rx, cy - ry), (cx + rx, cy + ry)], fill=color)
+        return image
+
+    def __call__(self, prompt=None, negative_prompt=None, num_inference_steps: int = 50,
+                 guidance_scale: float = 7.5, height: int = 512, width: int = 512,
+                 num_images_per_prompt: int = 1, prompt_embeds=None, generator=None, **kwargs):
+        if prompt_embeds is None:
+            prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+            prompt_embeds = np.concatenate([self.encode_prompt(text)[0] for text in prompts])
+        
+        count = len(prompt_embeds) * num_images_per_prompt
+        working_set = self._working_set(count, width, height)
+        del working_set
+        
+        if generator is None:
+            seeds = [0] * count
+        else:
+            # Как в diffusers: один генератор на изображение (здесь - seed или torch.Generator)
+            generators = generator if isinstance(generator, list) else [generator] * count
+            seeds = [g if isinstance(g, int) else g.initial_seed() for g in generators]
+        
+        images = [
+            self._render(embeds, seeds[n * num_images_per_prompt + index], index, width, height)
+            for n, embeds in enumerate(prompt_embeds)
+            for index in range(num_images_per_prompt)
+        ]
+        return SimpleNamespace(images=images)
+
+
 class VityazSpriteGenerator:
     """Генератор спрайтов для Витязь с использованием Stable Diffusion"""
     
-    def __init__(self, output_dir: str = "frontend/src/assets/graphics/sprites"):
+    def __init__(self, output_dir: str = "frontend/src/assets/graphics/sprites",
+                 max_batch_size: int = 4, embedding_cache_dir: Optional[str] = ".cache/sprite-embeddings",
+                 embedding_cache_mb: int = 256, io_workers: int = 2,
+                 memory_budget_mb: Optional[int] = None, candidates: int = 1,
+                 key_background: bool = True, palette_snap: bool = True, resample: str = "lanczos",
+                 webp: bool = True):
         self.output_dir = Path(output_dir)
         self.temp_dir = Path("frontend/src/assets/generated-temp")
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = "cpu"
+        self.model_id = "runwayml/stable-diffusion-v1-5"
         self.pipe = None
         self.generated_count = 0
+        self.max_batch_size = max(1, max_batch_size)
+        # Потоки для ресайза/сжатия/записи параллельно с инференсом (0 - последовательно)
+        self.io_workers = max(0, io_workers)
+        self.inference_seconds = 0.0
+        # --memory-budget: {canvas size: (профиль памяти, максимальный батч)}
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_plan: Dict[Tuple[int, int], Tuple[Tuple[str, ...], int]] = {}
+        self.peak_rss_mb = 0.0
+        # Кандидатов на промпт (ключ "candidates" в промпте имеет приоритет)
+        self.candidates = max(1, candidates)
+        # Постобработка по умолчанию (ключи "key_background"/"palette_snap" в промпте)
+        self.key_background = key_background
+        self.palette_snap = palette_snap
+        self.resample = resample
+        # Lossless WebP рядом с PNG, если он меньше
+        self.webp = webp
+        self.embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache_mb = embedding_cache_mb
+        self.embeddings = None  # PromptEmbeddingCache, создаётся в initialize_model
+        self.manifest = GenerationManifest(self.output_dir / "generation_manifest.json")
         
         # Создать директории
         (self.output_dir / "characters").mkdir(parents=True, exist_ok=True)
@@ -42,32 +649,78 @@ class VityazSpriteGenerator:
         
         print(f"🎨 VITYAZ AI Sprite Generator")
         print(f"📁 Output: {self.output_dir}")
-        print(f"🖥️  Device: {self.device}")
     
-    def initialize_model(self):
-        """Инициализация Stable Diffusion"""
+    def initialize_model(self, stand_in: bool = False):
+        """Инициализация Stable Diffusion (или локальной заглушки)"""
+        if stand_in:
+            self.model_id = "stand-in"
+            self.pipe = StandInPipeline()
+            self.init_embedding_cache()
+            print("\n⚙️  Используется StandInPipeline (без загрузки модели)\n")
+            return
+        
+        if not load_diffusers():
+            print("❌ Требуется установка зависимостей:")
+            print("   pip install torch diffusers transformers accelerate pillow")
+            sys.exit(1)
+        
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"🖥️  Device: {self.device}")
         print("\n⚙️  Загрузка Stable Diffusion v1.5...")
         print("   (Первый запуск: ~2GB скачивания)")
         
-        model_id = "runwayml/stable-diffusion-v1-5"
-        
         try:
             self.pipe = StableDiffusionPipeline.from_pretrained(
-                model_id,
+                self.model_id,
                 torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
             )
             self.pipe = self.pipe.to(self.device)
             
-            # Оптимизация памяти
-            if self.device == "cuda":
+            # Оптимизация памяти (с --memory-budget профиль подбирается калибровкой)
+            if self.device == "cuda" and not self.memory_budget_mb:
                 self.pipe.enable_attention_slicing()
             
+            self.init_embedding_cache()
             print("✅ Модель загружена успешно\n")
         except Exception as e:
             print(f"❌ Ошибка загрузки модели: {e}")
             sys.exit(1)
     
-    def get_prompts(self):
+    def init_embedding_cache(self):
+        """Открыть кэш эмбеддингов для текущей модели (если включён)"""
+        if self.embedding_cache_dir:
+            self.embeddings = PromptEmbeddingCache(
+                self.embedding_cache_dir, self.model_id, self.embedding_cache_mb * 1024 * 1024
+            )
+    
+    def encode_texts(self, texts: List[str]) -> Any:
+        """
+        Эмбеддинги текстов через кэш; энкодер вызывается только для промахов
+        
+        Args:
+            texts: Промпты или негативные промпты батча
+        
+        Returns:
+            Эмбеддинги батча (texts x tokens x dim)
+        """
+        encoded = {}
+        for text in texts:
+            text = normalize_prompt(text)
+            if text in encoded:
+                continue
+            embeds = self.embeddings.get(text)
+            if embeds is None:
+                embeds = self.pipe.encode_prompt(text, self.device, 1, False)[0]
+                self.embeddings.put(text, embeds)
+            encoded[text] = embeds
+        
+        batch = [encoded[normalize_prompt(text)] for text in texts]
+        if torch is not None and torch.is_tensor(batch[0]):
+            return torch.cat([embeds.to(self.device) for embeds in batch])
+        return np.concatenate(batch)
+    
+    @staticmethod
+    def get_prompts():
         """Оптимизированные промпты для каждого спрайта"""
         return {
             # ПЕРСОНАЖИ
@@ -164,110 +817,802 @@ class VityazSpriteGenerator:
             },
         }
     
-    def generate_sprite(self, name: str, config: dict):
-        """Генерация одного спрайта"""
-        print(f"🎨 Генерирую: {name}...")
+    def prepare_config(self, name: str, config: dict) -> dict:
+        """
+        Конфиг с параметрами по умолчанию (seed, steps, guidance); списки из JSON → кортежи
         
+        Raises:
+            ValueError: нет prompt/size или значения неверного типа
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"{name}: конфиг должен быть объектом")
+        missing = [key for key in ("prompt", "size") if key not in config]
+        if missing:
+            raise ValueError(f"{name}: нет ключей {', '.join(missing)}")
         try:
-            with torch.no_grad():
-                # Генерация изображения
-                result = self.pipe(
-                    prompt=config["prompt"],
-                    negative_prompt=config.get("negative", ""),
-                    num_inference_steps=50,
-                    guidance_scale=7.5,
-                    height=config["size"][1],
-                    width=config["size"][0]
-                )
-                
-                image = result.images[0]
-                
+            return self._prepare_config(name, config)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}") from None
+    
+    def _prepare_config(self, name: str, config: dict) -> dict:
+        return dict(
+            config,
+            size=tuple(config["size"]),
+            resize=tuple(config.get("resize", (64, 64))),
+            negative=config.get("negative", ""),
+            seed=int(config.get("seed", sprite_seed(name))),
+            steps=int(config.get("steps", DEFAULT_STEPS)),
+            guidance=float(config.get("guidance", DEFAULT_GUIDANCE)),
+            candidates=max(1, int(config.get("candidates", self.candidates))),
+            key_background=bool(config.get("key_background", self.key_background)),
+            palette_snap=bool(config.get("palette_snap", self.palette_snap)),
+            resample=self.check_resample(config.get("resample", self.resample)),
+        )
+    
+    @staticmethod
+    def check_resample(mode: str) -> str:
+        if mode not in RESAMPLE_MODES:
+            raise ValueError(f"Неизвестный resample '{mode}' (доступны: {', '.join(RESAMPLE_MODES)})")
+        return mode
+    
+    def generation_params(self, config: dict) -> dict:
+        """Всё, от чего зависит результат спрайта (для манифеста)"""
+        prompt_text = normalize_prompt(config["prompt"]) + "\n" + normalize_prompt(config["negative"])
+        return {
+            "model": self.model_id,
+            "prompt_hash": hashlib.sha256(prompt_text.encode()).hexdigest(),
+            "seed": config["seed"],
+            "num_inference_steps": config["steps"],
+            "guidance_scale": config["guidance"],
+            "size": list(config["size"]),
+            "resize": list(config["resize"]),
+            "candidates": config["candidates"],
+            "resample": config["resample"],
+            "postprocess": {
+                "key_background": config["key_background"],
+                "palette_snap": config["palette_snap"],
+                "lut_bits": LUT_BITS,
+            },
+        }
+    
+    def make_generators(self, seeds: List[int]) -> List[Any]:
+        """По генератору на изображение: результат не зависит от состава батча"""
+        if torch is not None and not isinstance(self.pipe, StandInPipeline):
+            return [torch.Generator(device=self.device).manual_seed(seed) for seed in seeds]
+        return list(seeds)
+    
+    def run_inference(self, configs: List[dict]) -> List[Image.Image]:
+        """
+        Один батч инференса для промптов одного размера
+        
+        Args:
+            configs: Конфиги спрайтов из prepare_config (одинаковые size, steps, guidance)
+        
+        Returns:
+            Изображения: по config["candidates"] подряд на каждый config
+        """
+        width, height = configs[0]["size"]
+        if configs[0]["size"] in self.memory_plan:
+            self.apply_memory_profile(self.memory_plan[configs[0]["size"]][0])
+        prompts = [config["prompt"] for config in configs]
+        negatives = [config.get("negative", "") for config in configs]
+        
+        with torch.no_grad() if torch is not None else contextlib.nullcontext():
+            if self.embeddings is not None:
+                # Готовые эмбеддинги: текстовый энкодер пропускается
+                text_inputs = {
+                    "prompt_embeds": self.encode_texts(prompts),
+                    "negative_prompt_embeds": self.encode_texts(negatives),
+                }
+            else:
+                text_inputs = {"prompt": prompts, "negative_prompt": negatives}
+            
+            result = self.pipe(
+                **text_inputs,
+                num_inference_steps=configs[0]["steps"],
+                guidance_scale=configs[0]["guidance"],
+                height=height,
+                width=width,
+                num_images_per_prompt=configs[0]["candidates"],
+                # Кандидат k получает seed + k: кандидат 0 совпадает с запуском без --candidates
+                generator=self.make_generators([
+                    config["seed"] + k for config in configs for k in range(config["candidates"])
+                ])
+            )
+        return result.images
+    
+    def downscale_images(self, frames: np.ndarray, configs: List[dict]) -> List[np.ndarray]:
+        """
+        Уменьшить кадры (N, H, W, 3) до resize своих конфигов
+        
+        Returns:
+            Уменьшенные кадры (h, w, 3) в исходном порядке
+        """
+        result = [None] * len(frames)
+        keys = [(config["resize"], config["resample"]) for config in configs]
+        for (resize, resample), indices in group_indices(keys).items():
+            if resample == "lanczos":
+                for index in indices:
+                    image = Image.fromarray(frames[index]).resize(resize, Image.Resampling.LANCZOS)
+                    result[index] = np.asarray(image)
+            else:
+                # Пиксель-арт: одним вызовом на всю группу
+                for index, pixels in zip(indices, pixel_downscale(frames[indices], resize, resample)):
+                    result[index] = pixels
+        return result
+    
+    def process_batch(self, batch: List[Tuple[str, dict]], images: List[Image.Image]) -> List[Any]:
+        """
+        Уменьшить, оценить, обработать и сохранить спрайты батча
+        
+        Выполняется в потоке пула ввода-вывода: только файлы, без общего
+        состояния. Постобработка векторизована по группам с одинаковым resize.
+        
+        Args:
+            batch: [(name, config), ...] в порядке инференса
+            images: Кадры батча, по config["candidates"] подряд на спрайт
+        
+        Returns:
+            На каждый спрайт (путь к полному размеру, путь к спрайту, оценки или None)
+            либо исключение, если спрайт не удалось сохранить
+        """
+        per_image = [config for _, config in batch for _ in range(config["candidates"])]
+        small = self.downscale_images(np.stack([np.asarray(image.convert("RGB")) for image in images]), per_image)
+        
+        # Лучший кандидат каждого спрайта
+        winners, all_scores = [], []
+        offset = 0
+        for _, config in batch:
+            span = range(offset, offset + config["candidates"])
+            offset += config["candidates"]
+            scores, best = None, 0
+            if len(span) > 1:
+                scores = {metric: values.tolist() for metric, values in
+                          score_candidates(np.stack([small[i] for i in span]), game_palette()).items()}
+                best = int(np.argmax(scores["total"]))
+            winners.append(span[best])
+            all_scores.append(scores)
+        
+        # Постобработка победителей одним вызовом на группу
+        finals: List[Optional[np.ndarray]] = [None] * len(batch)
+        keys = [(config["resize"], config["key_background"], config["palette_snap"]) for _, config in batch]
+        for (_, key, snap), indices in group_indices(keys).items():
+            pixels = np.stack([small[winners[i]] for i in indices])
+            if key or snap:
+                pixels = postprocess_sprites(pixels, game_palette(), key, snap)
+            for i, sprite in zip(indices, pixels):
+                finals[i] = sprite
+        
+        results = []
+        for (name, config), winner, final, scores in zip(batch, winners, finals, all_scores):
+            try:
                 # Сохранить полноразмерный вариант во временную папку
                 temp_path = self.temp_dir / f"{name.replace('/', '_')}_full.png"
-                image.save(temp_path)
-                print(f"   ✓ Полный размер: {temp_path}")
-                
-                # Уменьшить до финального размера
-                resize = config.get("resize", (64, 64))
-                image_resized = image.resize(resize, Image.Resampling.LANCZOS)
+                images[winner].save(temp_path)
                 
-                # Сохранить финальный спрайт
-                final_path = self.output_dir / f"{name}.png"
+                # Сохранить финальный спрайт: палитровый PNG, только если он меньше RGBA
+                final_path = self.sprite_path(name)
                 final_path.parent.mkdir(parents=True, exist_ok=True)
-                image_resized.save(final_path, optimize=True)
-                
-                file_size = final_path.stat().st_size / 1024
-                print(f"   ✅ {name}.png ({resize[0]}x{resize[1]}, {file_size:.1f}KB)")
-                
-                self.generated_count += 1
-                return True
+                sprite = Image.fromarray(final)
+                data = encode_png(sprite)
+                if config["key_background"] or config["palette_snap"]:
+                    indexed = quantize_indexed(sprite)
+                    indexed_data = encode_png(indexed) if indexed is not None else None
+                    if indexed_data is not None and len(indexed_data) < len(data):
+                        data = indexed_data
+                final_path.write_bytes(data)
                 
+                # Lossless WebP рядом с PNG, только если он меньше
+                webp_path = final_path.with_suffix('.webp')
+                webp_data = encode_webp(sprite) if self.webp else None
+                if webp_data is not None and len(webp_data) < len(data):
+                    webp_path.write_bytes(webp_data)
+                elif webp_path.exists():
+                    webp_path.unlink()
+                results.append((temp_path, final_path, scores))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    def finish_sprite(self, name: str, config: dict, result: Any) -> dict:
+        """Записать сохранённый спрайт в манифест и вернуть событие"""
+        if isinstance(result, Exception):
+            print(f"   ❌ Ошибка: {result}")
+            return {"event": "error", "name": name, "error": str(result)}
+        temp_path, final_path, scores = result
+        
+        resize = config["resize"]
+        file_size = final_path.stat().st_size / 1024
+        print(f"   ✓ Полный размер: {temp_path}")
+        
+        extra = {}
+        if scores is not None:
+            best = int(np.argmax(scores["total"]))
+            details = ", ".join(f"{metric} {scores[metric][best]:.2f}" for metric in SCORE_WEIGHTS)
+            others = " ".join(f"{total:.2f}" for k, total in enumerate(scores["total"]) if k != best)
+            print(f"   🏆 Кандидат {best + 1}/{len(scores['total'])}: {scores['total'][best]:.2f} "
+                  f"({details}); остальные: {others}")
+            extra = {"candidate": best, "scores": {m: [round(v, 4) for v in vs] for m, vs in scores.items()}}
+        webp_path = final_path.with_suffix('.webp')
+        webp = f", WebP {webp_path.stat().st_size / 1024:.1f}KB" if webp_path.exists() else ""
+        print(f"   ✅ {name}.png ({resize[0]}x{resize[1]}, {file_size:.1f}KB{webp})")
+        
+        self.generated_count += 1
+        self.manifest.record(name, self.generation_params(config), final_path, extra)
+        return {
+            "event": "sprite",
+            "name": name,
+            "path": str(final_path),
+            "size": list(resize),
+            "kb": round(file_size, 1),
+            **extra,
+        }
+    
+    def generate_sprite(self, name: str, config: dict):
+        """Генерация одного спрайта"""
+        print(f"🎨 Генерирую: {name}...")
+        
+        try:
+            config = self.prepare_config(name, config)
+            images = self.run_inference([config])
+            result = self.process_batch([(name, config)], images)[0]
         except Exception as e:
-            print(f"   ❌ Ошибка: {e}")
-            return False
+            result = e
+        return self.finish_sprite(name, config, result)["event"] == "sprite"
+    
+    def apply_memory_profile(self, options: Tuple[str, ...]):
+        """Включить перечисленные оптимизации памяти пайплайна, остальные выключить"""
+        for option in MEMORY_PROFILES[-1]:
+            method = f"{'enable' if option in options else 'disable'}_{option}"
+            if hasattr(self.pipe, method):
+                getattr(self.pipe, method)()
+    
+    def measure_peak(self, config: dict, count: int) -> float:
+        """Пик RSS (МБ) короткого прогона батча из count копий config"""
+        reset_peak_rss()
+        self.run_inference([dict(config, steps=CALIBRATION_STEPS, candidates=1)] * count)
+        return peak_rss_mb()
+    
+    def calibrate_memory(self, config: dict):
+        """
+        Подобрать профиль памяти и размер батча для холста config["size"]
+        
+        Берётся самый быстрый профиль, у которого батч из одного изображения
+        укладывается в бюджет; прирост пика от второго изображения задаёт
+        допустимый размер батча (с запасом 10%).
+        """
+        size = config["size"]
+        budget = self.memory_budget_mb * 0.9
+        print(f"🧪 Калибровка памяти для {size[0]}x{size[1]} (бюджет {self.memory_budget_mb} МБ)")
+        if not reset_peak_rss():
+            print("   ⚠️  Сброс пика RSS недоступен: оценка будет завышенной")
+        
+        for options in MEMORY_PROFILES:
+            self.apply_memory_profile(options)
+            single = self.measure_peak(config, 1)
+            label = ", ".join(options) or "без оптимизаций"
+            if single > budget:
+                print(f"   {label}: батч 1 → {single:.0f} МБ, не укладывается")
+                continue
+            
+            batch = 1
+            if self.max_batch_size > 1:
+                per_image = max(self.measure_peak(config, 2) - single, 1.0)
+                batch = int(min(self.max_batch_size, 1 + (budget - single) // per_image))
+            print(f"   {label}: батч 1 → {single:.0f} МБ, выбран батч {batch}")
+            self.memory_plan[size] = (options, batch)
+            return
+        
+        print(f"   ⚠️  Даже {', '.join(MEMORY_PROFILES[-1])} превышает бюджет; батч 1")
+        self.memory_plan[size] = (MEMORY_PROFILES[-1], 1)
+    
+    def batch_limit(self, size: Tuple[int, int]) -> int:
+        """Максимальный батч для холста: из калибровки или --max-batch-size"""
+        return self.memory_plan[size][1] if size in self.memory_plan else self.max_batch_size
+    
+    def plan_batches(self, prompts: Dict[str, dict]) -> List[List[Tuple[str, dict]]]:
+        """
+        Сгруппировать промпты по размеру холста (и steps/guidance) и разбить на батчи
+        
+        Args:
+            prompts: Конфиги из prepare_config
+        
+        Returns:
+            Список батчей [(name, config), ...], не длиннее batch_limit(size)
+        """
+        groups: Dict[Tuple, List[Tuple[str, dict]]] = {}
+        for name, config in prompts.items():
+            key = (config["size"], config["steps"], config["guidance"], config["candidates"])
+            groups.setdefault(key, []).append((name, config))
+        
+        batches = []
+        for (size, _, _, candidates), group in groups.items():
+            # Лимит батча - в изображениях, а каждый промпт даёт candidates штук
+            limit = max(1, self.batch_limit(size) // candidates)
+            for start in range(0, len(group), limit):
+                batches.append(group[start:start + limit])
+        return batches
+    
+    def sprite_path(self, name: str) -> Path:
+        """
+        Путь финального спрайта по имени (напр. weapons/svd)
+        
+        Raises:
+            ValueError: имя пустое или выводит за пределы output_dir
+                (имена приходят и от клиентов воркера)
+        """
+        root = self.output_dir.resolve()
+        path = self.output_dir / f"{name}.png"
+        if not isinstance(name, str) or not name or root not in path.resolve().parents:
+            raise ValueError(f"недопустимое имя спрайта: {name!r}")
+        return path
+    
+    def pending_prompts(self, prompts: Dict[str, dict], force: bool = False) -> Dict[str, dict]:
+        """Промпты, чьих актуальных спрайтов нет в манифесте (все при force)"""
+        prompts = {name: self.prepare_config(name, config) for name, config in prompts.items()}
+        if force:
+            return prompts
+        return {
+            name: config for name, config in prompts.items()
+            if not self.manifest.is_current(name, self.generation_params(config),
+                                            self.sprite_path(name))
+        }
+    
+    def iter_generate(self, prompts: Dict[str, dict], force: bool = False) -> Iterator[dict]:
+        """
+        Сгенерировать спрайты батчами, выдавая событие на каждый спрайт
+        
+        Args:
+            prompts: {name: config}; size/resize могут быть списками (из JSON)
+            force: Генерировать заново даже актуальные спрайты
+        
+        Yields:
+            {"event": "sprite", name, path, size, kb}, {"event": "skipped", name}
+            или {"event": "error", name, error}
+        """
+        self.manifest.load()  # Воркер мог пропустить запуски без него
+        pending = self.pending_prompts(prompts, force)
+        for name in prompts:
+            if name not in pending:
+                print(f"⏭️  {name} (актуален)")
+                yield {"event": "skipped", "name": name}
+        prompts = pending
+        total = len(prompts)
+        done = 0
+        
+        if self.memory_budget_mb:
+            for config in prompts.values():
+                if config["size"] not in self.memory_plan:
+                    self.calibrate_memory(config)
+            reset_peak_rss()
+        
+        # Пока пул обрабатывает и пишет батч N, модель уже считает батч N+1.
+        # Очередь ограничена, чтобы в памяти не копились полноразмерные кадры.
+        in_flight = collections.deque()  # (batch, Future)
+        
+        def finished(limit: int) -> Iterator[dict]:
+            """Отдать готовые батчи; ждать, только если в очереди больше limit"""
+            nonlocal done
+            while in_flight and (in_flight[0][1].done() or len(in_flight) > limit):
+                batch, processed = in_flight.popleft()
+                try:
+                    results = processed.result()
+                except Exception as e:
+                    results = [e] * len(batch)
+                for (name, config), result in zip(batch, results):
+                    done += 1
+                    print(f"[{done}/{total}] {name}")
+                    yield self.finish_sprite(name, config, result)
+        
+        with ThreadPoolExecutor(max(1, self.io_workers), thread_name_prefix="sprite-io") as pool:
+            for batch in self.plan_batches(prompts):
+                width, height = batch[0][1]["size"]
+                print(f"🎨 Батч {width}x{height}: {', '.join(name for name, _ in batch)}")
+                started = time.perf_counter()
+                try:
+                    images = self.run_inference([config for _, config in batch])
+                except Exception as e:
+                    print(f"   ❌ Ошибка: {e}\n")
+                    done += len(batch)
+                    for name, _ in batch:
+                        yield {"event": "error", "name": name, "error": str(e)}
+                    continue
+                finally:
+                    self.inference_seconds += time.perf_counter() - started
+                
+                in_flight.append((batch, pool.submit(self.process_batch, batch, images)))
+                del images
+                yield from finished(self.io_workers)
+            
+            yield from finished(0)
+        
+        self.peak_rss_mb = peak_rss_mb()
+        if self.embeddings is not None:
+            self.embeddings.save()
     
-    def generate_all(self):
-        """Генерация всех спрайтов"""
-        prompts = self.get_prompts()
+    def generate_all(self, names: Optional[List[str]] = None, force: bool = False):
+        """
+        Генерация всех спрайтов батчами по размеру холста
+        
+        Args:
+            names: Только эти спрайты (все, если не указано)
+            force: Игнорировать манифест и генерировать всё заново
+        """
+        prompts = select_prompts(self.get_prompts(), names)
         total = len(prompts)
         
-        print(f"\n🚀 Начинаю генерацию {total} спрайтов...\n")
+        print(f"\n🚀 Начинаю генерацию {total} спрайтов (до {self.max_batch_size} на батч)...\n")
         
-        for i, (name, config) in enumerate(prompts.items(), 1):
-            print(f"[{i}/{total}] ", end="")
-            self.generate_sprite(name, config)
-            print()  # Пустая строка между спрайтами
+        started = time.perf_counter()
+        skipped = 0
+        for event in self.iter_generate(prompts, force):
+            skipped += event["event"] == "skipped"
+        elapsed = time.perf_counter() - started
         
         print(f"\n✅ Генерация завершена!")
-        print(f"   Успешно: {self.generated_count}/{total}")
+        print(f"   Успешно: {self.generated_count}/{total - skipped}")
+        print(f"   Пропущено (актуальны): {skipped}")
+        print(f"   Манифест: {self.manifest.path}")
         print(f"   Спрайты: {self.output_dir}")
         print(f"   Полные: {self.temp_dir}")
+        print(f"   ⏱️  Всего {elapsed:.1f} с, из них инференс {self.inference_seconds:.1f} с")
+        budget = f" (бюджет {self.memory_budget_mb} МБ)" if self.memory_budget_mb else ""
+        print(f"   🧠 Пик памяти: {self.peak_rss_mb:.0f} МБ{budget}")
         
-    def create_index(self):
-        """Создать индексный файл со списком спрайтов"""
-        index_path = self.output_dir / "sprites_index.json"
-        
-        import json
-        
-        index = {
-            "generated": str(self.generated_count),
-            "characters": [
-                "player_idle.png",
-                "player_walk_down.png", 
-                "player_walk_up.png",
-                "enemy_basic.png",
-                "enemy_armed.png",
-                "enemy_heavy.png"
-            ],
-            "weapons": [
-                "ak74m.png",
-                "svd.png",
-                "rpk74m.png",
-                "pmm.png"
-            ]
-        }
+        if self.embeddings is not None:
+            print(f"   📦 Кэш эмбеддингов: {self.embeddings.hits} попаданий, "
+                  f"{self.embeddings.misses} промахов")
+        
+    def write_manifest(self):
+        """Обновить manifest.json по реально существующим спрайтам"""
+        manifest_path, stats = update_manifest(self.output_dir)
+        print(f"\n📋 Манифест ассетов: {manifest_path} ({stats['assets']} файлов, "
+              f"пересчитано {stats['scanned']}, без изменений {stats['reused']})")
+
+def select_prompts(prompts: Dict[str, dict], names: Optional[List[str]]) -> Dict[str, dict]:
+    """Отобрать промпты по именам (все, если names пуст)"""
+    if not names:
+        return prompts
+    unknown = [name for name in names if name not in prompts]
+    if unknown:
+        print(f"❌ Неизвестные спрайты: {', '.join(unknown)}")
+        print(f"   Доступны: {', '.join(prompts)}")
+        sys.exit(1)
+    return {name: prompts[name] for name in names}
+
+
+# ==================== ВОРКЕР ====================
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """
+    'host:port' - TCP на localhost, иначе путь к Unix-сокету
+    
+    Raises:
+        ValueError: хост не loopback. Воркер принимает задания без
+            авторизации и пишет файлы, поэтому наружу он не слушает.
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        host = host or "127.0.0.1"
+        try:
+            loopback = host == "localhost" or ipaddress.IPv4Address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"воркер доступен только через localhost или Unix-сокет, не {host}")
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class SpriteWorkerHandler(socketserver.StreamRequestHandler):
+    """
+    Один запрос - одна JSON-строка, ответ - поток JSON-строк (событий)
+    
+    Запросы: {"sprites": {name: config}} или {"command": "shutdown"}
+    Задание с именем вне output_dir отклоняется целиком (done с "error")
+    """
+    
+    def send(self, event: dict):
+        self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode())
+        self.wfile.flush()
+    
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError as e:
+            self.send({"event": "done", "error": f"bad request: {e}"})
+            return
         
-        with open(index_path, 'w') as f:
-            json.dump(index, f, indent=2)
+        if isinstance(request, dict) and request.get("command") == "shutdown":
+            self.send({"event": "done", "generated": 0, "total": 0})
+            threading.Thread(target=self.server.shutdown).start()
+            return
         
-        print(f"\n📋 Индекс создан: {index_path}")
+        prompts = request.get("sprites", {}) if isinstance(request, dict) else None
+        try:
+            if not isinstance(prompts, dict):
+                raise ValueError('ожидается {"sprites": {name: config}}')
+            for name, config in prompts.items():
+                self.server.generator.sprite_path(name)
+                self.server.generator.prepare_config(name, config)
+        except ValueError as e:
+            self.send({"event": "done", "error": f"bad request: {e}"})
+            return
+        
+        started = time.perf_counter()
+        generated = skipped = 0
+        try:
+            # Пайплайн не потокобезопасен: запросы выполняются по очереди
+            with self.server.lock:
+                for event in self.server.generator.iter_generate(prompts, request.get("force", False)):
+                    generated += event["event"] == "sprite"
+                    skipped += event["event"] == "skipped"
+                    self.send(event)
+                self.server.generator.write_manifest()
+            self.send({
+                "event": "done",
+                "generated": generated,
+                "skipped": skipped,
+                "total": len(prompts),
+                "peak_mb": round(self.server.generator.peak_rss_mb),
+                "seconds": round(time.perf_counter() - started, 2),
+            })
+        except (BrokenPipeError, ConnectionResetError):
+            print("⚠️  Клиент отключился")
+        except Exception as e:
+            # Клиент ждёт завершающее событие done
+            print(f"❌ Задание не выполнено: {e}")
+            self.send({"event": "done", "error": str(e)})
+
+
+def serve(generator: VityazSpriteGenerator, address: str):
+    """Держать загруженную модель и принимать задания, пока не остановят"""
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            # Сокет от прошлого запуска: удалить, если никто не слушает
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(addr)
+                print(f"❌ Воркер уже запущен: {addr}")
+                sys.exit(1)
+            except OSError:
+                os.unlink(addr)
+            finally:
+                probe.close()
+        Path(addr).parent.mkdir(parents=True, exist_ok=True)
+        server = socketserver.ThreadingUnixStreamServer(addr, SpriteWorkerHandler)
+    else:
+        server = socketserver.ThreadingTCPServer(addr, SpriteWorkerHandler)
+    
+    server.daemon_threads = True
+    server.generator = generator
+    server.lock = threading.Lock()
+    print(f"🔌 Воркер слушает {address} (Ctrl+C - остановить)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.unlink(addr)
+    print("\n👋 Воркер остановлен")
+
+
+def submit(address: str, request: dict) -> dict:
+    """
+    Отправить запрос воркеру и печатать события по мере поступления
+    
+    Returns:
+        Финальное событие "done"
+    """
+    family, addr = parse_address(address)
+    try:
+        conn = socket.create_connection(addr) if family == socket.AF_INET else socket.socket(family)
+        if family == socket.AF_UNIX:
+            conn.connect(addr)
+    except OSError as e:
+        print(f"❌ Воркер недоступен ({address}): {e}")
+        print("   Запустите: python3 tools/generate_sprites.py --serve")
+        sys.exit(1)
+    
+    with conn, conn.makefile("rwb") as stream:
+        stream.write((json.dumps(request, ensure_ascii=False) + "\n").encode())
+        stream.flush()
+        for line in stream:
+            event = json.loads(line)
+            if event["event"] == "sprite":
+                print(f"   ✅ {event['name']}.png ({event['size'][0]}x{event['size'][1]}, "
+                      f"{event['kb']:.1f}KB) → {event['path']}")
+            elif event["event"] == "skipped":
+                print(f"   ⏭️  {event['name']} (актуален)")
+            elif event["event"] == "error":
+                print(f"   ❌ {event['name']}: {event['error']}")
+            elif event["event"] == "done":
+                return event
+    print("❌ Воркер закрыл соединение")
+    sys.exit(1)
+
 
 def main():
     """Главная функция"""
+    parser = argparse.ArgumentParser(description="VITYAZ AI Sprite Generator")
+    parser.add_argument(
+        '--output-dir',
+        default='frontend/src/assets/graphics/sprites',
+        help='Папка для готовых спрайтов'
+    )
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=4,
+        help='Максимум промптов одного размера в одном вызове модели'
+    )
+    parser.add_argument(
+        '--candidates',
+        type=int,
+        default=1,
+        help='Кандидатов на промпт: лучший выбирается автоматически по оценке'
+    )
+    parser.add_argument(
+        '--resample',
+        choices=RESAMPLE_MODES,
+        default='lanczos',
+        help='Уменьшение до размера спрайта: lanczos, mode (цвет большинства) или edge (края)'
+    )
+    parser.add_argument(
+        '--no-key-background',
+        action='store_true',
+        help='Не делать фон спрайтов прозрачным'
+    )
+    parser.add_argument(
+        '--no-palette-snap',
+        action='store_true',
+        help='Не привязывать цвета спрайтов к палитре игры'
+    )
+    parser.add_argument(
+        '--no-webp',
+        action='store_true',
+        help='Не сохранять lossless WebP рядом с PNG'
+    )
+    parser.add_argument(
+        '--memory-budget',
+        type=parse_size_mb,
+        help='Предел пиковой памяти, напр. 6G: калибровка подберёт батч и slicing/tiling'
+    )
+    parser.add_argument(
+        '--io-workers',
+        type=int,
+        default=2,
+        help='Потоки сохранения спрайтов параллельно с инференсом (0 - последовательно)'
+    )
+    parser.add_argument(
+        '--stand-in',
+        action='store_true',
+        help='Локальная заглушка вместо Stable Diffusion (без загрузки модели)'
+    )
+    parser.add_argument(
+        '--only',
+        action='append',
+        metavar='NAME',
+        help='Сгенерировать только этот спрайт (можно повторять), напр. weapons/svd'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Генерировать заново даже спрайты, актуальные по манифесту'
+    )
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Запустить воркер: модель загружается один раз и ждёт заданий'
+    )
+    parser.add_argument(
+        '--client',
+        action='store_true',
+        help='Отправить задания запущенному воркеру вместо загрузки модели'
+    )
+    parser.add_argument(
+        '--stop-worker',
+        action='store_true',
+        help='Остановить запущенный воркер'
+    )
+    parser.add_argument(
+        '--socket',
+        default=DEFAULT_WORKER_ADDRESS,
+        help='Адрес воркера: путь к Unix-сокету или host:port'
+    )
+    parser.add_argument(
+        '--embedding-cache',
+        default='.cache/sprite-embeddings',
+        help='Папка кэша эмбеддингов промптов'
+    )
+    parser.add_argument(
+        '--embedding-cache-mb',
+        type=int,
+        default=256,
+        help='Максимальный размер кэша эмбеддингов (МБ)'
+    )
+    parser.add_argument(
+        '--no-embedding-cache',
+        action='store_true',
+        help='Кодировать промпты заново при каждом запуске'
+    )
+    args = parser.parse_args()
+    
+    try:
+        parse_address(args.socket)
+    except ValueError as e:
+        print(f"❌ --socket: {e}")
+        sys.exit(1)
+    
+    if args.stop_worker:
+        submit(args.socket, {"command": "shutdown"})
+        print("👋 Воркер остановлен")
+        return
+    
+    if args.client:
+        # Настройки самого воркера задаются при его запуске
+        worker_options = [f"--{dest.replace('_', '-')}" for dest in (
+            "output_dir", "max_batch_size", "no_webp", "memory_budget", "io_workers", "stand_in",
+            "embedding_cache", "embedding_cache_mb", "no_embedding_cache",
+        ) if getattr(args, dest) != parser.get_default(dest)]
+        if worker_options:
+            print(f"❌ {', '.join(worker_options)} задаются при запуске воркера (--serve), не с --client")
+            sys.exit(1)
+        
+        # Промпты берутся из этого файла: правки видны без перезапуска воркера.
+        # Флаги спрайта уходят в конфиг; ключи самого промпта важнее
+        overrides = {key: value for key, value, default in (
+            ("candidates", args.candidates, parser.get_default("candidates")),
+            ("resample", args.resample, parser.get_default("resample")),
+            ("key_background", not args.no_key_background, True),
+            ("palette_snap", not args.no_palette_snap, True),
+        ) if value != default}
+        prompts = {name: dict(overrides, **config) for name, config in
+                   select_prompts(VityazSpriteGenerator.get_prompts(), args.only).items()}
+        print(f"📨 Отправляю {len(prompts)} спрайтов воркеру {args.socket}")
+        result = submit(args.socket, {"sprites": prompts, "force": args.force})
+        if "error" in result:
+            print(f"❌ Воркер отклонил задание: {result['error']}")
+            sys.exit(1)
+        print(f"\n✅ {result['generated']} сгенерировано, {result['skipped']} актуальны "
+              f"({result['total']} всего) за {result['seconds']:.1f} с")
+        if result["generated"] + result["skipped"] < result["total"]:
+            sys.exit(1)
+        return
+    
     print("=" * 60)
     print("  VITYAZ: Special Operations - AI Sprite Generator")
     print("=" * 60)
     
-    generator = VityazSpriteGenerator()
+    generator = VityazSpriteGenerator(
+        args.output_dir,
+        max_batch_size=args.max_batch_size,
+        embedding_cache_dir=None if args.no_embedding_cache else args.embedding_cache,
+        embedding_cache_mb=args.embedding_cache_mb,
+        io_workers=args.io_workers,
+        memory_budget_mb=args.memory_budget,
+        candidates=args.candidates,
+        key_background=not args.no_key_background,
+        palette_snap=not args.no_palette_snap,
+        resample=args.resample,
+        webp=not args.no_webp
+    )
     
     # Инициализировать модель
-    generator.initialize_model()
+    generator.initialize_model(stand_in=args.stand_in)
+    
+    if args.serve:
+        serve(generator, args.socket)
+        return
     
     # Генерировать все спрайты
-    generator.generate_all()
+    generator.generate_all(args.only, force=args.force)
     
-    # Создать индекс
-    generator.create_index()
+    # Обновить манифест ассетов
+    generator.write_manifest()
     
     print("\n" + "=" * 60)
     print("  ✅ ВСЁ ГОТОВО!")
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+VITYAZ Graphics Benchmark
+Regression benchmark for the procedural asset generator
+
+Measures, for each AssetGenerator method across a range of sizes:
+- Wall time (best and median of N runs)
+- Peak memory growth
+- Encoded bytes
+
+Results are compared against a stored baseline JSON; the run fails when a
+metric (median wall time, peak memory, bytes) regresses by more than the
+configured threshold, or when there is no baseline to compare against.
+
+Usage: python3 graphics-benchmark.py [options]
+Example: python3 tools/graphics-benchmark.py --save-baseline
+         python3 tools/graphics-benchmark.py --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Any
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import numpy as np
+import PIL
+
+from asset_common import load_generator_module
+
+TOOLS_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = TOOLS_DIR / "benchmarks" / "graphics-baseline.json"
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process in KB (0 if unknown)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class GraphicsBenchmark:
+    """Benchmark cases for AssetGenerator (use as a context manager to remove its work directory)"""
+
+    def __init__(self, repeat: int = 7, warmup: int = 1):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.module = load_generator_module()
+        self._work_dir = tempfile.TemporaryDirectory(prefix="vityaz-bench-")
+        self.work_dir = Path(self._work_dir.name)
+        self.generator = self.module.AssetGenerator(str(self.work_dir / "assets"), cache_dir=None)
+        # Load PIL's lazy plugins/codecs once here rather than inside every case
+        self.generator.encode_image(self.generator.generate_vityaz_head(8))
+
+    def close(self):
+        """Remove the work directory"""
+        self._work_dir.cleanup()
+
+    def __enter__(self) -> "GraphicsBenchmark":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ==================== CASES ====================
+
+    def cases(self) -> Dict[str, Callable[[], int]]:
+        """
+        Benchmark cases by name
+
+        Each case renders (and encodes) once and returns the encoded byte count.
+        """
+        gen = self.generator
+        cases: Dict[str, Callable[[], int]] = {}
+
+        def encoded(render: Callable) -> Callable[[], int]:
+            return lambda: len(gen.encode_image(render())[0])
+
+        for size in (32, 64, 128, 256):
+            cases[f"generate_vityaz_head[size={size}]"] = encoded(
+                lambda size=size: gen.generate_vityaz_head(size))
+            cases[f"generate_vityaz_torso[size={size}]"] = encoded(
+                lambda size=size: gen.generate_vityaz_torso(size))
+
+        for size in ((16, 12), (32, 16), (48, 12), (128, 64)):
+            cases[f"generate_ak74m_sprite[size={size[0]}x{size[1]}]"] = encoded(
+                lambda size=size: gen.generate_ak74m_sprite(size))
+
+        for tile_type in self.module.TILE_STYLES:
+            for size in (32, 128):
+                cases[f"generate_tile[{tile_type},size={size}]"] = encoded(
+                    lambda tile_type=tile_type, size=size: gen.generate_tile(tile_type, size))
+
+        for frame in (1, 2, 3):
+            for size in (16, 64):
+                cases[f"generate_muzzle_flash[frame={frame},size={size}]"] = encoded(
+                    lambda frame=frame, size=size: gen.generate_muzzle_flash(frame, size))
+
+        for size in (128, 256, 512):
+            cases[f"generate_emblem[size={size}]"] = encoded(
+                lambda size=size: gen.generate_emblem(size))
+
+        for count in (16, 64):
+            cases[f"create_spritesheet[frames={count}]"] = self._spritesheet_case(count)
+
+        return cases
+
+    def _spritesheet_case(self, count: int) -> Callable[[], int]:
+        """Pack count mixed-size frames; returns total bytes written"""
+        gen = self.generator
+        makers = [
+            lambda: gen.generate_vityaz_head(64),
+            lambda: gen.generate_vityaz_torso(48),
+            lambda: gen.generate_ak74m_sprite((32, 16)),
+            lambda: gen.generate_ak74m_sprite((48, 12)),
+            lambda: gen.generate_tile('grass', 32),
+            lambda: gen.generate_muzzle_flash(2, 16),
+        ]
+        frames = {f"frame_{idx:03d}": makers[idx % len(makers)]() for idx in range(count)}
+        output_path = self.work_dir / f"sheet_{count}" / "atlas.png"
+
+        def run() -> int:
+            # Remove earlier pages so every run encodes and writes them again
+            for old in output_path.parent.glob("*"):
+                old.unlink()
+            return sum(path.stat().st_size for path in gen.create_spritesheet(frames, str(output_path)))
+
+        return run
+
+    # ==================== MEASUREMENT ====================
+
+    def measure(self, case: Callable[[], int]) -> Dict[str, Any]:
+        """
+        Time a case and record its peak memory growth and encoded size
+
+        Args:
+            case: Case callable
+
+        Returns:
+            Metrics dict
+        """
+        start_rss = peak_rss_kb()
+        for _ in range(self.warmup):
+            case()
+
+        timings = []
+        encoded_bytes = 0
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            encoded_bytes = case()
+            timings.append(time.perf_counter() - started)
+        rss_growth = peak_rss_kb() - start_rss
+
+        # Separate traced run: tracemalloc's own bookkeeping would inflate RSS
+        tracemalloc.start()
+        case()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "seconds": min(timings),
+            "seconds_median": float(np.median(timings)),
+            # RSS growth catches PIL's native buffers, tracemalloc Python/NumPy ones
+            "peak_kb": max(rss_growth, traced_peak // 1024),
+            "bytes": encoded_bytes,
+        }
+
+    def _measure_in_child(self, case: Callable[[], int], conn):
+        with open(os.devnull, 'w') as devnull:
+            sys.stdout = devnull
+            conn.send(self.measure(case))
+        conn.close()
+
+    def run(self, selected: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run cases, each in a forked process when possible so peak memory
+        of one case does not hide the next
+
+        Args:
+            selected: Substrings of case names to run (all if empty)
+
+        Returns:
+            Metrics by case name
+        """
+        results = {}
+        fork = "fork" in multiprocessing.get_all_start_methods()
+
+        for name, case in self.cases().items():
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            if fork:
+                ctx = multiprocessing.get_context("fork")
+                parent_conn, child_conn = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=self._measure_in_child, args=(case, child_conn))
+                process.start()
+                child_conn.close()
+                metrics = parent_conn.recv()
+                process.join()
+            else:
+                stdout = sys.stdout
+                sys.stdout = open(os.devnull, 'w')
+                try:
+                    metrics = self.measure(case)
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+            results[name] = metrics
+            print(f"  {name:<48} {metrics['seconds_median'] * 1000:9.3f} ms "
+                  f"{metrics['peak_kb']:8d} KB {metrics['bytes']:9d} B")
+        return results
+
+
+def environment() -> Dict[str, str]:
+    """Versions that affect timings and encoded output"""
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            thresholds: Dict[str, float]) -> List[Tuple[str, str, float, float]]:
+    """
+    Find metrics that regressed beyond their threshold
+
+    Args:
+        results: Current metrics by case
+        baseline: Baseline metrics by case
+        thresholds: Allowed relative growth per metric ("seconds_median", "peak_kb", "bytes")
+
+    Returns:
+        (case, metric, baseline value, current value) for each regression
+    """
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, threshold in thresholds.items():
+            before, after = baseline[name][metric], metrics[metric]
+            # Small absolute changes are scheduler/allocator jitter: ignore under 5 ms and 1 MB
+            floor = {"seconds_median": 0.005, "peak_kb": 1024, "bytes": 0}[metric]
+            if after > before * (1 + threshold) and after - before > floor:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VITYAZ Graphics Benchmark")
+    parser.add_argument(
+        '--baseline',
+        default=str(DEFAULT_BASELINE),
+        help='Baseline JSON to compare against'
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Write the results as the new baseline instead of comparing'
+    )
+    parser.add_argument(
+        '--output',
+        help='Also write the results JSON here'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=7,
+        help='Timed runs per case (the median is compared)'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.25,
+        help='Allowed relative median wall-time regression (0.25 = 25%%)'
+    )
+    parser.add_argument(
+        '--memory-threshold',
+        type=float,
+        default=0.25,
+        help='Allowed relative peak-memory regression'
+    )
+    parser.add_argument(
+        '--bytes-threshold',
+        type=float,
+        default=0.0,
+        help='Allowed relative encoded-size regression'
+    )
+    parser.add_argument(
+        'cases',
+        nargs='*',
+        help='Only run cases whose name contains one of these strings'
+    )
+
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("⏱️  VITYAZ GRAPHICS BENCHMARK")
+    print("=" * 50)
+
+    with GraphicsBenchmark(repeat=args.repeat) as benchmark:
+        print(f"\n{'case':<50} {'time':>12} {'peak':>11} {'size':>11}")
+        results = benchmark.run(args.cases)
+    report = {"environment": environment(), "repeat": args.repeat, "cases": results}
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        if baseline_path.exists() and args.cases:
+            # Partial run: keep the other cases
+            previous = json.loads(baseline_path.read_text())
+            report["cases"] = dict(previous.get("cases", {}), **results)
+        baseline_path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Baseline saved: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"\n❌ No baseline at {baseline_path}; run with --save-baseline first")
+        sys.exit(1)
+
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("environment") != report["environment"]:
+        print("\n⚠️  Baseline was recorded in a different environment:")
+        print(f"   baseline: {baseline.get('environment')}")
+        print(f"   current:  {report['environment']}")
+
+    regressions = compare(results, baseline.get("cases", {}), {
+        "seconds_median": args.threshold,
+        "peak_kb": args.memory_threshold,
+        "bytes": args.bytes_threshold,
+    })
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s):")
+        for name, metric, before, after in regressions:
+            print(f"   {name} {metric}: {before:g} → {after:g} ({(after / before - 1) * 100:+.1f}%)"
+                  if before else f"   {name} {metric}: {before:g} → {after:g}")
+        sys.exit(1)
+
+    print(f"\n✅ No regressions against {baseline_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,40 +10,825 @@ Generates:
 - Effects and particles
 - Tileset and maps
 
-Usage: python3 graphics-generator.py [command]
+Usage: python3 graphics-generator.py [build TARGET...] [options]
 Example: python3 graphics-generator.py --generate-all
+         python3 graphics-generator.py build characters atlas
+         python3 graphics-generator.py build sprites/characters/vityaz_operator.png
 """
 
 import os
 import sys
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 import json
 from pathlib import Path
 import argparse
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional, Any, Callable
 import math
+import io
+import zlib
+import base64
+import filecmp
+import hashlib
+import inspect
+import types
+import time
+import threading
+import traceback
+import contextlib
+import importlib
+import multiprocessing
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import asset_common
+import asset_manifest
+from asset_common import (ColorPalette, encode_png, encode_webp, quantize_indexed,
+                          write_atomic, write_if_changed)
+from asset_manifest import load_manifest, update_manifest
+
+class AssetJob:
+    """
+    One output file and the generator method that renders it
+
+    A job is a node of the build graph; inputs are the jobs whose images its
+    method consumes through AssetGenerator.node_image.
+    """
+
+    def __init__(self, path: str, method: str, label: str = "",
+                 inputs: Optional[List['AssetJob']] = None, **params):
+        self.path = path
+        self.method = method
+        self.params = params
+        self.inputs = list(inputs or [])
+        self.label = label or path
+        # Set on @Nx copies made by AssetGenerator.scale_job
+        self.source_path = path
+        self.scale = 1
+
+
+class AssetCache:
+    """
+    Content-addressed cache of encoded assets
+
+    Maps a cache key (method, parameters, code fingerprint, palette) to the
+    SHA-256 of the encoded bytes, which are kept under objects/, plus the
+    encoder's info about them.
+    """
+
+    def __init__(self, cache_dir: str = ".cache/graphics-generator"):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_path = self.cache_dir / "index.json"
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.png"
+
+    def _load(self, digest: str) -> Optional[bytes]:
+        try:
+            data = self._object_path(digest).read_bytes()
+        except OSError:
+            return None
+        return data if hashlib.sha256(data).hexdigest() == digest else None
+
+    def _store(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(object_path, data)
+        return digest
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Return cached (bytes, info) for key, or None on a miss
+
+        Alternate encodings stored with the entry come back in info["alternates"].
+        """
+        entry = self.index.get(key)
+        if isinstance(entry, dict):
+            data = self._load(entry["digest"])
+            alternates = {fmt: self._load(digest) for fmt, digest in entry.get("alternates", {}).items()}
+            if data is not None and None not in alternates.values():
+                self.hits += 1
+                info = dict(entry.get("info", {}))
+                if alternates:
+                    info["alternates"] = alternates
+                return data, info
+        self.index.pop(key, None)
+        self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, info: Optional[Dict[str, Any]] = None,
+            alternates: Optional[Dict[str, bytes]] = None):
+        """Store encoded bytes (and alternate encodings by format) under their content hash"""
+        entry = {"digest": self._store(data), "info": info or {}}
+        if alternates:
+            entry["alternates"] = {fmt: self._store(alt) for fmt, alt in alternates.items()}
+        self.index[key] = entry
+
+    def save(self):
+        """Persist the key index"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.index_path, json.dumps(self.index, indent=2, sort_keys=True).encode())
+
+
+# Encodings written next to an asset's PNG when they are smaller
+ALTERNATE_FORMATS = ('webp',)
+
+
+def trim_transparent(image: Image.Image) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Crop an RGBA image to the bounding box of its non-transparent pixels
+
+    Args:
+        image: RGBA image
+
+    Returns:
+        Cropped image and the offset of its top-left corner in the original
+        (a fully transparent image keeps only its top-left pixel)
+    """
+    bbox = image.getchannel('A').getbbox() or (0, 0, 1, 1)
+    if bbox == (0, 0) + image.size:
+        return image, (0, 0)
+    return image.crop(bbox), bbox[:2]
+
+
+class StageTracer:
+    """
+    Records per-asset pipeline stages as Chrome trace events
+
+    Timestamps come from the monotonic clock, which is shared across
+    processes, so events from pool workers line up with the parent's.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.events: List[Dict[str, Any]] = []
+        self.asset = ""
+
+    @contextlib.contextmanager
+    def span(self, stage: str, asset: Optional[str] = None):
+        """Time the enclosed block as one stage of an asset"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.events.append({
+                "name": stage,
+                "cat": "asset",
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"asset": asset or self.asset},
+            })
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Return and clear the recorded events"""
+        events, self.events = self.events, []
+        return events
+
+
+class NullTracer:
+    """Tracer used when profiling is off: every span is one shared no-op"""
+
+    asset = ""
+    _span = contextlib.nullcontext()
+
+    def span(self, stage: str, asset: Optional[str] = None):
+        return self._span
+
+    def drain(self) -> List[Dict[str, Any]]:
+        return []
+
+
+def summarize_trace(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Exclusive (self) time per stage and per asset from nested trace events
+
+    Args:
+        events: Chrome trace "X" events
+
+    Returns:
+        {"stages": {stage: {"ms", "count"}}, "assets": {asset: {"ms", "stages"}}}
+    """
+    self_time: Dict[int, float] = {}
+    threads: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+    for event in events:
+        threads.setdefault((event["pid"], event["tid"]), []).append(event)
+        self_time[id(event)] = event["dur"]
+
+    for thread_events in threads.values():
+        stack: List[Dict[str, Any]] = []
+        for event in sorted(thread_events, key=lambda e: (e["ts"], -e["dur"])):
+            while stack and stack[-1]["ts"] + stack[-1]["dur"] <= event["ts"]:
+                stack.pop()
+            if stack:
+                self_time[id(stack[-1])] -= event["dur"]
+            stack.append(event)
+
+    stages: Dict[str, Dict[str, float]] = {}
+    assets: Dict[str, Dict[str, Any]] = {}
+    for event in events:
+        ms = self_time[id(event)] / 1000
+        stage = stages.setdefault(event["name"], {"ms": 0.0, "count": 0})
+        stage["ms"] += ms
+        stage["count"] += 1
+        asset = assets.setdefault(event["args"]["asset"], {"ms": 0.0, "stages": {}})
+        asset["ms"] += ms
+        asset["stages"][event["name"]] = asset["stages"].get(event["name"], 0.0) + ms
+    return {"stages": stages, "assets": assets}
+
+
+# Generator instance owned by each process-pool worker
+_worker_generator = None
+
+
+def node_key(method: str, params: Dict[str, Any]) -> str:
+    """Identity of a rendered image: generator method plus parameters"""
+    return json.dumps([method, params], sort_keys=True, default=list)
+
+
+def _init_worker(generator: 'AssetGenerator'):
+    global _worker_generator
+    _worker_generator = generator
+    # A forked worker starts with the parent's spans; only report its own
+    generator.tracer.drain()
+
+
+def _run_in_worker(task: Callable, item: Any) -> Tuple[Any, List[Dict[str, Any]]]:
+    result = task(_worker_generator, item)
+    return result, _worker_generator.tracer.drain()
+
+
+class MaxRectsPacker:
+    """
+    MaxRects bin packer using the best-short-side-fit heuristic
+
+    Keeps a list of maximal free rectangles; each insert picks the free
+    rectangle that leaves the smallest leftover on its shorter side.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free_rects: List[Tuple[int, int, int, int]] = [(0, 0, width, height)]
+
+    def insert(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        """
+        Place a rectangle
+
+        Args:
+            width: Rectangle width
+            height: Rectangle height
+
+        Returns:
+            (x, y) position, or None if it does not fit
+        """
+        best = None
+        best_score = None
+        for fx, fy, fw, fh in self.free_rects:
+            if width <= fw and height <= fh:
+                leftover_w, leftover_h = fw - width, fh - height
+                score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h), fy, fx)
+                if best_score is None or score < best_score:
+                    best, best_score = (fx, fy), score
+
+        if best is None:
+            return None
+
+        self._split(best[0], best[1], width, height)
+        self._prune()
+        return best
+
+    def _split(self, ux: int, uy: int, uw: int, uh: int):
+        """Replace free rectangles overlapped by the used one with their remainders"""
+        split_rects = []
+        for rect in self.free_rects:
+            fx, fy, fw, fh = rect
+            if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+                split_rects.append(rect)
+                continue
+            if ux > fx:
+                split_rects.append((fx, fy, ux - fx, fh))
+            if ux + uw < fx + fw:
+                split_rects.append((ux + uw, fy, fx + fw - ux - uw, fh))
+            if uy > fy:
+                split_rects.append((fx, fy, fw, uy - fy))
+            if uy + uh < fy + fh:
+                split_rects.append((fx, uy + uh, fw, fy + fh - uy - uh))
+        self.free_rects = split_rects
+
+    def _prune(self):
+        """Drop free rectangles contained in another free rectangle"""
+        rects = sorted(set(self.free_rects), key=lambda r: r[2] * r[3], reverse=True)
+        kept: List[Tuple[int, int, int, int]] = []
+        for x, y, w, h in rects:
+            if not any(kx <= x and ky <= y and x + w <= kx + kw and y + h <= ky + kh
+                       for kx, ky, kw, kh in kept):
+                kept.append((x, y, w, h))
+        self.free_rects = kept
+
+
+def pack_rects(rects: List[Tuple[str, int, int]], width: int,
+               height: int) -> Tuple[Dict[str, Tuple[int, int]], List[Tuple[str, int, int]]]:
+    """
+    Pack rectangles into one bin
+
+    Args:
+        rects: (name, width, height) in insertion order
+        width: Bin width
+        height: Bin height
+
+    Returns:
+        Placements by name, and the rectangles that did not fit
+    """
+    packer = MaxRectsPacker(width, height)
+    placed: Dict[str, Tuple[int, int]] = {}
+    rejected = []
+    for name, w, h in rects:
+        position = packer.insert(w, h)
+        if position is None:
+            rejected.append((name, w, h))
+        else:
+            placed[name] = position
+    return placed, rejected
+
+
+def plan_atlas_pages(rects: List[Tuple[str, int, int]], max_size: int = 2048,
+                     power_of_two: bool = True) -> List[Tuple[Tuple[int, int], Dict[str, Tuple[int, int]]]]:
+    """
+    Split rectangles over as few, as small atlas pages as possible
+
+    Each page gets the smallest bin (by area) that holds every remaining
+    rectangle; when even a max_size page is too small, a full page is
+    filled and the rest spills into the next one.
+
+    Args:
+        rects: (name, width, height), already including padding
+        max_size: Maximum page width and height
+        power_of_two: Restrict page sides to powers of two
+
+    Returns:
+        List of ((page_width, page_height), placements by name)
+    """
+    for name, w, h in rects:
+        if w > max_size or h > max_size:
+            raise ValueError(f"Frame '{name}' ({w}x{h}) (with padding) exceeds atlas page size {max_size}")
+
+    if power_of_two:
+        sides = [1 << n for n in range(2, max_size.bit_length()) if 1 << n <= max_size]
+        if sides[-1] != max_size:
+            sides.append(max_size)
+    else:
+        sides = list(range(4, max_size + 1, 4))
+        if sides[-1] != max_size:
+            sides.append(max_size)
+
+    # Largest first packs tighter and keeps the layout deterministic
+    remaining = sorted(rects, key=lambda r: (-max(r[1], r[2]), -r[1] * r[2], r[0]))
+    pages = []
+
+    while remaining:
+        area = sum(w * h for _, w, h in remaining)
+        widest = max(w for _, w, _ in remaining)
+        tallest = max(h for _, _, h in remaining)
+        best = None
+
+        for width in sides:
+            if width < widest:
+                continue
+            heights = [h for h in sides if h >= tallest and width * h >= area]
+            if best is not None:
+                heights = [h for h in heights if width * h < best[0] * best[1]]
+            # Binary search the shortest page height that fits everything
+            lo, hi, found = 0, len(heights) - 1, None
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                placed, rejected = pack_rects(remaining, width, heights[mid])
+                if rejected:
+                    lo = mid + 1
+                else:
+                    found = (width, heights[mid], placed)
+                    hi = mid - 1
+            if found is not None:
+                best = found
+
+        if best is not None:
+            pages.append(((best[0], best[1]), best[2]))
+            break
+
+        placed, remaining = pack_rects(remaining, max_size, max_size)
+        pages.append(((max_size, max_size), placed))
+
+    return pages
+
+
+# Terrain look per tile type: base colour, fBm noise amplitude and lattice
+# cells (x, y), speckle density/shade, crack count/colour, grass tuft count/colour
+TILE_STYLES = {
+    'concrete': {'color': (200, 200, 200), 'noise': 0.05, 'cells': (4, 4),
+                 'speckle': (0.06, 0.88), 'cracks': (2, (180, 180, 180))},
+    'asphalt': {'color': (50, 50, 50), 'noise': 0.08, 'cells': (4, 4),
+                'speckle': (0.15, 1.5), 'cracks': (1, (35, 35, 35))},
+    'grass': {'color': (34, 139, 34), 'noise': 0.12, 'cells': (4, 4),
+              'speckle': (0.05, 0.8), 'tufts': (9, (20, 100, 20))},
+    'dirt': {'color': (139, 90, 43), 'noise': 0.12, 'cells': (4, 4),
+             'speckle': (0.12, 0.75)},
+    'wood': {'color': (160, 82, 45), 'noise': 0.15, 'cells': (1, 8)},
+}
+
+TILE_OUTLINE = (100, 100, 100)
+
+# Procedural maps: noise feature sizes in tiles, thresholds on 0..1 noise,
+# city block pitch and road width in tiles, share of blocks paved with wood
+MAP_RULES = {'urban_scale': 96, 'urban_level': 0.6, 'moisture_scale': 40, 'wet_level': 0.45,
+             'block': 12, 'road_width': 2, 'yard_share': 0.2}
+# Per-map overrides of MAP_RULES (names match the frontend's map keys)
+MAP_PRESETS = {
+    'default': {},
+    'forest': {'urban_level': 1.1, 'wet_level': 0.3},
+    'urban': {'urban_level': 0.3, 'block': 10},
+}
+
+# Declarative sprite specs (JSON), one directory per asset category
+SPEC_DIR = Path(__file__).resolve().parent / "asset-specs"
+SPEC_SHAPES = ('rectangle', 'ellipse', 'polygon', 'line')
+
+# Generator parameters multiplied by the scale factor in multi-scale output
+SCALABLE_PARAMS = ('size', 'width', 'height')
+
+# Batch frame renderers (AssetGenerator methods) and their channel defaults
+ANIMATION_RENDERERS = {
+    'flash': ('render_flash_frames', {'scale': 1.0, 'rotation': 0.0, 'intensity': 1.0}),
+    'operator': ('render_operator_frames',
+                 {'bob': 0.0, 'stride': 0.0, 'arm': 0.0, 'recoil': 0.0, 'flash': 0.0}),
+}
+
+# Keyframed animations: output sheet, renderer, frame size at 1x, frame count,
+# Phaser playback and keyframes as channel -> [(time 0..1, value)].
+# Looping animations end on their first pose, so time 1 is not sampled twice.
+ANIMATIONS = {
+    'muzzle_flash': {
+        'path': 'effects/particles/muzzle_flash_sheet.png', 'renderer': 'flash',
+        'size': (16, 16), 'frames': 6, 'frame_rate': 30, 'repeat': 0,
+        'keys': {'scale': [(0, 1.0), (1, 0.3)], 'rotation': [(0, 0), (1, 45)],
+                 'intensity': [(0, 1.0), (1, 0.0)]},
+    },
+    'player_walk': {
+        'path': 'sprites/characters/player_walk.png', 'renderer': 'operator',
+        'size': (32, 64), 'frames': 8, 'frame_rate': 8, 'repeat': -1, 'loop': True,
+        'keys': {'stride': [(0, 0), (0.25, 0.6), (0.5, 0), (0.75, -0.6), (1, 0)],
+                 'arm': [(0, 0), (0.25, -0.5), (0.5, 0), (0.75, 0.5), (1, 0)],
+                 'bob': [(0, 0), (0.25, -0.015), (0.5, 0), (0.75, -0.015), (1, 0)]},
+    },
+    'player_run': {
+        'path': 'sprites/characters/player_run.png', 'renderer': 'operator',
+        'size': (32, 64), 'frames': 6, 'frame_rate': 10, 'repeat': -1, 'loop': True,
+        'keys': {'stride': [(0, 0), (0.25, 1), (0.5, 0), (0.75, -1), (1, 0)],
+                 'arm': [(0, 0), (0.25, -1), (0.5, 0), (0.75, 1), (1, 0)],
+                 'bob': [(0, 0), (0.25, -0.03), (0.5, 0), (0.75, -0.03), (1, 0)]},
+    },
+    'player_shoot': {
+        'path': 'sprites/characters/player_shoot.png', 'renderer': 'operator',
+        'options': {'weapon': True},
+        'size': (32, 64), 'frames': 3, 'frame_rate': 15, 'repeat': 0,
+        'keys': {'recoil': [(0, 0), (0.5, 0.08), (1, 0)], 'flash': [(0, 1.0), (0.5, 0.5), (1, 0)]},
+    },
+}
+
+
+def hash_unit(seed: int, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Deterministic value in [0, 1) per integer world coordinate
+
+    Args:
+        seed: Seed
+        x, y: Integer coordinate arrays (any sign)
+
+    Returns:
+        Array of floats shaped like x and y
+    """
+    with np.errstate(over='ignore'):
+        h = (np.asarray(x, dtype=np.int64).view(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+             ^ np.asarray(y, dtype=np.int64).view(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+             ^ np.uint64(seed & 0xFFFFFFFF) * np.uint64(0x165667B19E3779F9))
+        # splitmix64 finaliser
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    return (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def world_noise(seed: int, x: np.ndarray, y: np.ndarray, scale: float, octaves: int = 3) -> np.ndarray:
+    """
+    fBm value noise over world coordinates, lattice values hashed per point
+
+    Any region can be evaluated on its own and matches its neighbours, so
+    maps are generated chunk by chunk without a global noise array.
+
+    Args:
+        seed: Seed
+        x, y: World coordinate arrays (tiles)
+        scale: Feature size of the first octave in tiles
+        octaves: Octaves, each half the feature size and amplitude
+
+    Returns:
+        Noise in 0..1 shaped like x and y
+    """
+    total = np.zeros(np.shape(x))
+    weight = 0.0
+    for octave in range(octaves):
+        cell = scale / 2 ** octave
+        u, v = np.asarray(x) / cell, np.asarray(y) / cell
+        i, j = np.floor(u).astype(np.int64), np.floor(v).astype(np.int64)
+        tx, ty = u - i, v - j
+        tx, ty = tx * tx * (3 - 2 * tx), ty * ty * (3 - 2 * ty)
+        corners = [hash_unit(seed + octave, i + di, j + dj) for dj in (0, 1) for di in (0, 1)]
+        top = corners[0] * (1 - tx) + corners[1] * tx
+        bottom = corners[2] * (1 - tx) + corners[3] * tx
+        total += (top * (1 - ty) + bottom * ty) * 0.5 ** octave
+        weight += 0.5 ** octave
+    return total / weight
+
+
+def map_chunk_terrain(x0: int, y0: int, width: int, height: int, seed: int,
+                      rules: Dict[str, Any]) -> np.ndarray:
+    """
+    Terrain of one map region by rule from world noise
+
+    Urban areas (high urban noise) get an asphalt road grid around concrete
+    blocks, some paved with wood; elsewhere wet ground is grass and dry
+    ground dirt.
+
+    Args:
+        x0, y0: Top-left tile
+        width, height: Region size in tiles
+        seed: Map seed
+        rules: MAP_RULES with overrides
+
+    Returns:
+        (height, width) indices into TILE_STYLES
+    """
+    terrain_ids = {name: idx for idx, name in enumerate(TILE_STYLES)}
+    y, x = np.mgrid[y0:y0 + height, x0:x0 + width]
+    urban = world_noise(seed, x, y, rules['urban_scale']) > rules['urban_level']
+    wet = world_noise(seed + 101, x, y, rules['moisture_scale']) > rules['wet_level']
+    block = rules['block']
+    road = (x % block < rules['road_width']) | (y % block < rules['road_width'])
+    yard = hash_unit(seed + 202, x // block, y // block) < rules['yard_share']
+
+    terrain = np.where(wet, terrain_ids['grass'], terrain_ids['dirt'])
+    paved = np.where(road, terrain_ids['asphalt'],
+                     np.where(yard, terrain_ids['wood'], terrain_ids['concrete']))
+    return np.where(urban, paved, terrain)
+
+
+def sample_keyframes(keys: Dict[str, List[Tuple[float, float]]], count: int, loop: bool = False,
+                     defaults: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Linearly interpolate keyed channels for every frame at once
+
+    Args:
+        keys: Channel -> [(time 0..1, value)]
+        count: Number of frames
+        loop: Sample times 0..(count-1)/count, so the frame after the last is the first
+        defaults: Every channel the renderer takes, with its value when not keyed
+
+    Returns:
+        Channel -> (count,) values
+    """
+    times = np.arange(count) / (count if loop else max(count - 1, 1))
+    channels = {name: np.full(count, float(value)) for name, value in (defaults or {}).items()}
+    for name, points in keys.items():
+        if defaults is not None and name not in defaults:
+            raise ValueError(f"Unknown animation channel '{name}' (expected one of {', '.join(defaults)})")
+        key_times, values = zip(*sorted(points))
+        channels[name] = np.interp(times, key_times, values)
+    return channels
+
+
+def dedupe_frames(frames: List[np.ndarray], tolerance: int = 0) -> Tuple[List[int], List[int]]:
+    """
+    Find frames that repeat an earlier one
+
+    Exact repeats are found by hash; with a tolerance, a frame also matches
+    an earlier unique frame when no channel of any pixel differs by more.
+    Colour under fully transparent pixels is ignored.
+
+    Args:
+        frames: (H, W, 4) uint8 RGBA frames in order
+        tolerance: Largest per-channel difference still treated as equal
+
+    Returns:
+        Indices of the unique frames, and for every frame the index of the
+        unique frame it is stored as
+    """
+    unique: List[int] = []
+    by_hash: Dict[bytes, int] = {}
+    cleaned = []
+    mapping = []
+    for idx, frame in enumerate(frames):
+        frame = np.where(frame[..., 3:] == 0, 0, frame).astype(np.uint8)
+        cleaned.append(frame)
+        digest = hashlib.blake2b(repr(frame.shape).encode() + frame.tobytes(), digest_size=16).digest()
+        match = by_hash.get(digest)
+        if match is None and tolerance:
+            match = next((other for other in unique if cleaned[other].shape == frame.shape and
+                          np.abs(cleaned[other].astype(np.int16) - frame).max() <= tolerance), None)
+        if match is None:
+            match = idx
+            unique.append(idx)
+        by_hash.setdefault(digest, match)
+        mapping.append(match)
+    return unique, mapping
+
+
+def _value_noise(lattice: np.ndarray, size: int) -> np.ndarray:
+    """
+    Smoothly interpolate a wrapping random lattice up to size x size
+
+    Args:
+        lattice: (N, cells_y, cells_x) random values
+        size: Output side in pixels
+
+    Returns:
+        (N, size, size) noise, tileable on both axes
+    """
+    def axis(cells: int):
+        u = (np.arange(size) + 0.5) * cells / size - 0.5
+        i0 = np.floor(u).astype(int)
+        t = u - i0
+        return i0 % cells, (i0 + 1) % cells, t * t * (3 - 2 * t)
+
+    y0, y1, ty = axis(lattice.shape[1])
+    x0, x1, tx = axis(lattice.shape[2])
+    top = lattice[:, y0][:, :, x0] * (1 - tx) + lattice[:, y0][:, :, x1] * tx
+    bottom = lattice[:, y1][:, :, x0] * (1 - tx) + lattice[:, y1][:, :, x1] * tx
+    return top * (1 - ty[:, None]) + bottom * ty[:, None]
+
+
+def _stamp(mask: np.ndarray, points: np.ndarray, valid: np.ndarray):
+    """
+    Set mask pixels at a batch of (x, y) points, wrapping at the edges
+
+    Args:
+        mask: (N, size, size) boolean mask, modified in place
+        points: (N, ..., 2) float coordinates
+        valid: (N, ...) which points to draw
+    """
+    size = mask.shape[1]
+    batch_idx = np.broadcast_to(
+        np.arange(mask.shape[0]).reshape((-1,) + (1,) * (valid.ndim - 1)), valid.shape)
+    coords = np.rint(points).astype(int) % size
+    mask[batch_idx[valid], coords[..., 1][valid], coords[..., 0][valid]] = True
+
+
+def render_tile_variants(tile_type: str, size: int = 32, seed: int = 0,
+                         start: int = 0, count: int = 1) -> np.ndarray:
+    """
+    Render a batch of seeded terrain tile variants as one array
+
+    Variant v is drawn from its own generator seeded by (seed, terrain, v),
+    so it is reproducible and independent of how many variants are batched.
+    Layers: fBm value noise shading, speckle, random-walk cracks and grass
+    tufts, all wrapping so tiles repeat seamlessly inside the outline.
+
+    Args:
+        tile_type: Terrain name from TILE_STYLES
+        size: Tile size
+        seed: Base seed
+        start: First variant index
+        count: Number of variants
+
+    Returns:
+        (count, size, size, 4) uint8 RGBA
+    """
+    style = TILE_STYLES.get(tile_type, {'color': (100, 100, 100)})
+    terrain_id = zlib.crc32(tile_type.encode())
+    rngs = [np.random.default_rng([seed, terrain_id, variant])
+            for variant in range(start, start + count)]
+
+    shade = np.ones((count, size, size))
+
+    if style.get('noise'):
+        cells_x, cells_y = style['cells']
+        noise = np.zeros((count, size, size))
+        total = 0.0
+        for octave in range(3):
+            lattice = np.stack([rng.random((cells_y << octave, cells_x << octave)) for rng in rngs])
+            noise += _value_noise(lattice, size) * 0.5 ** octave
+            total += 0.5 ** octave
+        shade += style['noise'] * (noise / total - 0.5) * 2
+
+    if 'speckle' in style:
+        density, speckle_shade = style['speckle']
+        speckle = np.stack([rng.random((size, size)) for rng in rngs]) < density
+        shade[speckle] *= speckle_shade
+
+    rgb = np.clip(np.array(style['color'], dtype=float) * shade[..., None], 0, 255)
+
+    if 'cracks' in style:
+        max_cracks, crack_color = style['cracks']
+        steps = size
+        params = np.stack([rng.random((max_cracks, 5)) for rng in rngs])
+        turns = np.stack([rng.normal(0, 0.35, (max_cracks, steps)) for rng in rngs])
+        heading = params[..., 2:3] * 2 * np.pi + np.cumsum(turns, axis=-1)
+        walk = np.cumsum(np.stack([np.cos(heading), np.sin(heading)], axis=-1), axis=-2)
+        points = params[..., None, 0:2] * size + walk
+        length = (0.3 + 0.7 * params[..., 3:4]) * steps
+        valid = (params[..., 4:5] < 0.7) & (np.arange(steps) < length)
+        cracks = np.zeros((count, size, size), dtype=bool)
+        _stamp(cracks, points, valid)
+        rgb[cracks] = crack_color
+
+    if 'tufts' in style:
+        tuft_count, tuft_color = style['tufts']
+        roots = np.stack([rng.random((tuft_count, 2)) for rng in rngs]) * size
+        stroke = np.array([(0, 0), (1, -1), (1, -2), (2, -3)])
+        points = roots[:, :, None, :] + stroke
+        tufts = np.zeros((count, size, size), dtype=bool)
+        _stamp(tufts, points, np.ones(points.shape[:-1], dtype=bool))
+        rgb[tufts] = tuft_color
+
+    rgb[:, [0, -1], :] = TILE_OUTLINE
+    rgb[:, :, [0, -1]] = TILE_OUTLINE
+
+    alpha = np.full((count, size, size, 1), 255, dtype=np.uint8)
+    return np.concatenate([rgb.astype(np.uint8), alpha], axis=-1)
+
+
+def enlarge(tiles: np.ndarray, scale: int) -> np.ndarray:
+    """Nearest-neighbour enlarge (..., height, width, channels) pixel art by an integer factor"""
+    if scale == 1:
+        return tiles
+    return tiles.repeat(scale, axis=-3).repeat(scale, axis=-2)
+
 
-class ColorPalette:
-    """VITYAZ official color palette"""
-    KRAPOVY_MAROON = (139, 21, 56)      # #8B1538
-    MILITARY_GREEN = (61, 74, 61)       # #3D4A3D
-    TACTICAL_BLACK = (26, 26, 26)       # #1A1A1A
-    GOLD_ACCENT = (212, 175, 55)        # #D4AF37
-    WHITE = (255, 255, 255)
-    DARK_GRAY = (90, 90, 90)
-    LIGHT_GRAY = (200, 200, 200)
-    RED = (192, 21, 47)
-    GREEN = (34, 197, 94)
-    BLUE = (59, 130, 246)
-    
 class AssetGenerator:
     """Generate game assets programmatically"""
     
-    def __init__(self, output_dir: str = "frontend/public/assets"):
+    def __init__(self, output_dir: str = "frontend/public/assets",
+                 cache_dir: Optional[str] = ".cache/graphics-generator",
+                 jobs: int = 1, atlas_padding: int = 2, atlas_max_size: int = 2048,
+                 tile_variants: int = 4, tile_seed: int = 0,
+                 spec_dir: str = str(SPEC_DIR), indexed: bool = True,
+                 scales: Tuple[int, ...] = (1,), profile: bool = False,
+                 frame_tolerance: int = 2, trim: bool = True,
+                 map_size: Tuple[int, int] = (128, 128), map_chunk: int = 16,
+                 webp: bool = True):
         self.output_dir = Path(output_dir)
         self.colors = ColorPalette()
+        self.cache = AssetCache(cache_dir) if cache_dir else None
+        self.jobs = max(1, jobs)
+        self.atlas_padding = atlas_padding
+        self.atlas_max_size = atlas_max_size
+        self.tile_variants = tile_variants
+        self.tile_seed = tile_seed
+        self.spec_dir = Path(spec_dir)
+        self.indexed = indexed
+        self.scales = tuple(sorted(set(scales)))
+        self.frame_tolerance = frame_tolerance
+        self.trim = trim
+        self.map_size = map_size
+        self.map_chunk = map_chunk
+        self.webp = webp
+        self.tracer = StageTracer() if profile else NullTracer()
+        self.encode_stats = {"assets": 0, "indexed": 0, "rgba_bytes": 0, "bytes": 0,
+                             "webp": 0, "smallest_bytes": 0}
+        self._fingerprints: Dict[str, str] = {}
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        # Images rendered during the current build, by node_key (see node_image)
+        self._images: Dict[str, Image.Image] = {}
+        # Key of each build step that ran (see step_key)
+        self.step_keys: Dict[str, str] = {}
+        self.frame_layouts: Dict[str, Dict[str, Any]] = {}
+        # Atlas pages waiting to be encoded (see batched_pages)
+        self._pending_pages: Optional[List[Tuple[str, Path, Image.Image, Path, bytes]]] = None
         self.ensure_directories()
     
+    def __getstate__(self):
+        # Pool workers only render; the cache stays in the parent process
+        state = self.__dict__.copy()
+        state['cache'] = None
+        return state
+    
     def ensure_directories(self):
         """Create required directory structure"""
         dirs = [
@@ -58,18 +843,20 @@ class AssetGenerator:
             "maps/tilesets",
             "maps/objects",
             "audio/weapons",
+            "atlases",
         ]
         for d in dirs:
             (self.output_dir / d).mkdir(parents=True, exist_ok=True)
     
     # ==================== CHARACTER SPRITES ====================
     
-    def generate_vityaz_head(self, size: int = 64) -> Image.Image:
+    def generate_vityaz_head(self, size: int = 64, scale: int = 1) -> Image.Image:
         """
         Generate Vityaz operator head with krapovy beret
         
         Args:
             size: Sprite size (64x64 default)
+            scale: Resolution multiplier for pixel offsets and line widths
         
         Returns:
             PIL Image
@@ -85,17 +872,17 @@ class AssetGenerator:
         
         # Main beret shape (slightly tilted left)
         points = [
-            (beret_left, beret_top + 5),
+            (beret_left, beret_top + 5 * scale),
             (beret_right, beret_top),
-            (beret_right - 3, beret_bottom),
-            (beret_left + 3, beret_bottom + 2),
+            (beret_right - 3 * scale, beret_bottom),
+            (beret_left + 3 * scale, beret_bottom + 2 * scale),
         ]
         draw.polygon(points, fill=self.colors.KRAPOVY_MAROON)
         
         # Beret band (black)
         band_y = int(size * 0.4)
         draw.rectangle(
-            [(beret_left, band_y), (beret_right, band_y + 3)],
+            [(beret_left, band_y), (beret_right, band_y + 3 * scale)],
             fill=self.colors.TACTICAL_BLACK
         )
         
@@ -107,7 +894,8 @@ class AssetGenerator:
             [(badge_x - badge_size, badge_y - badge_size),
              (badge_x + badge_size, badge_y + badge_size)],
             fill=self.colors.GOLD_ACCENT,
-            outline=self.colors.TACTICAL_BLACK
+            outline=self.colors.TACTICAL_BLACK,
+            width=scale
         )
         
         # Face (skin tone)
@@ -142,17 +930,18 @@ class AssetGenerator:
         draw.line(
             [(int(size * 0.4), mouth_y), (int(size * 0.6), mouth_y)],
             fill=self.colors.TACTICAL_BLACK,
-            width=1
+            width=scale
         )
         
         return img
     
-    def generate_vityaz_torso(self, size: int = 64) -> Image.Image:
+    def generate_vityaz_torso(self, size: int = 64, scale: int = 1) -> Image.Image:
         """
         Generate tactical armor and uniform body
         
         Args:
             size: Sprite size
+            scale: Resolution multiplier for line widths
         
         Returns:
             PIL Image
@@ -180,7 +969,8 @@ class AssetGenerator:
         draw.rectangle(
             [(armor_x1, armor_y1), (armor_x2, armor_y2)],
             fill=(45, 55, 45),  # Darker green
-            outline=self.colors.TACTICAL_BLACK
+            outline=self.colors.TACTICAL_BLACK,
+            width=scale
         )
         
         # Tactical pouches (3 vertical sections)
@@ -196,7 +986,8 @@ class AssetGenerator:
                 [(pouch_x, armor_y1 + int(size * 0.1)),
                  (pouch_x + pouch_width, armor_y2 - int(size * 0.1))],
                 fill=self.colors.TACTICAL_BLACK,
-                outline=self.colors.DARK_GRAY
+                outline=self.colors.DARK_GRAY,
+                width=scale
             )
         
         # Shoulders (armor plates)
@@ -216,79 +1007,49 @@ class AssetGenerator:
         
         return img
     
-    def generate_ak74m_sprite(self, size: Tuple[int, int] = (32, 16)) -> Image.Image:
+    def generate_vityaz_operator(self, size: int = 64, scale: int = 1) -> Image.Image:
         """
-        Generate AK-74M assault rifle sprite
+        Compose full operator body from head and torso
         
         Args:
-            size: Sprite dimensions (width, height)
+            size: Sprite size
+            scale: Resolution multiplier passed to the head and torso
         
         Returns:
             PIL Image
         """
-        width, height = size
-        img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+        # Same parameters as the head and torso jobs, so their images are shared
+        parts = {"size": size, "scale": scale} if scale != 1 else {"size": size}
+        head = self.node_image("generate_vityaz_head", **parts)
+        torso = self.node_image("generate_vityaz_torso", **parts)
         
-        # Stock (wooden, brown)
-        stock_x1 = int(width * 0.05)
-        stock_x2 = int(width * 0.35)
-        stock_y1 = int(height * 0.4)
-        stock_y2 = int(height * 0.6)
-        draw.rectangle(
-            [(stock_x1, stock_y1), (stock_x2, stock_y2)],
-            fill=(139, 69, 19)  # Saddle brown
-        )
-        
-        # Receiver (black steel)
-        receiver_x1 = int(width * 0.3)
-        receiver_x2 = int(width * 0.8)
-        receiver_y1 = int(height * 0.35)
-        receiver_y2 = int(height * 0.65)
-        draw.rectangle(
-            [(receiver_x1, receiver_y1), (receiver_x2, receiver_y2)],
-            fill=self.colors.TACTICAL_BLACK
-        )
-        
-        # Barrel (darker black, thin)
-        barrel_x1 = int(width * 0.75)
-        barrel_x2 = int(width * 0.95)
-        barrel_y1 = int(height * 0.42)
-        barrel_y2 = int(height * 0.58)
-        draw.rectangle(
-            [(barrel_x1, barrel_y1), (barrel_x2, barrel_y2)],
-            fill=(10, 10, 10)
-        )
+        full_body = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        with self.tracer.span("composite"):
+            full_body.paste(head, (0, 0), head)
+            full_body.paste(torso, (0, size * 5 // 16), torso)
         
-        # Gas tube (upper rail)
-        gas_y1 = int(height * 0.25)
-        gas_y2 = int(height * 0.35)
-        draw.rectangle(
-            [(receiver_x1, gas_y1), (barrel_x2, gas_y2)],
-            fill=(50, 50, 50),
-            outline=self.colors.DARK_GRAY
-        )
+        return full_body
+    
+    def generate_ak74m_sprite(self, size: Tuple[int, int] = (32, 16)) -> Image.Image:
+        """
+        Generate AK-74M assault rifle sprite
         
-        # Muzzle brake (detail)
-        muzzle_x = int(width * 0.95)
-        muzzle_y_mid = int(height * 0.5)
-        draw.polygon(
-            [(muzzle_x, muzzle_y_mid - 2),
-             (width, muzzle_y_mid - 3),
-             (width, muzzle_y_mid + 3),
-             (muzzle_x, muzzle_y_mid + 2)],
-            fill=(30, 30, 30)
-        )
+        Args:
+            size: Sprite dimensions (width, height)
         
-        return img
+        Returns:
+            PIL Image
+        """
+        return self.render_spec("weapons/ak74m", size)
     
-    def generate_health_bar(self, width: int = 200, height: int = 20) -> Image.Image:
+    def generate_health_bar(self, width: int = 200, height: int = 20, scale: int = 1) -> Image.Image:
         """
         Generate health bar UI element
         
         Args:
             width: Bar width
             height: Bar height
+            scale: Resolution multiplier for pixel offsets and line widths
         
         Returns:
             PIL Image
@@ -297,10 +1058,13 @@ class AssetGenerator:
         draw = ImageDraw.Draw(img)
         
         # Background (dark)
+        # Rectangle corners are inclusive pixels: at scale N a 1x end pixel ends N - 1 further
+        edge = scale - 1
         draw.rectangle(
-            [(0, 0), (width, height)],
+            [(0, 0), (width + edge, height + edge)],
             fill=(30, 30, 30),
-            outline=self.colors.DARK_GRAY
+            outline=self.colors.DARK_GRAY,
+            width=scale
         )
         
         # Health (green gradient simulation)
@@ -309,25 +1073,26 @@ class AssetGenerator:
         bar_y = int((height - bar_height) / 2)
         
         draw.rectangle(
-            [(2, bar_y), (bar_width, bar_y + bar_height)],
+            [(2 * scale, bar_y), (bar_width + edge, bar_y + bar_height + edge)],
             fill=self.colors.GREEN
         )
         
         # Border
         draw.rectangle(
-            [(2, bar_y), (bar_width, bar_y + bar_height)],
+            [(2 * scale, bar_y), (bar_width + edge, bar_y + bar_height + edge)],
             outline=self.colors.WHITE,
-            width=1
+            width=scale
         )
         
         return img
     
-    def generate_crosshair(self, size: int = 32) -> Image.Image:
+    def generate_crosshair(self, size: int = 32, scale: int = 1) -> Image.Image:
         """
         Generate crosshair UI element
         
         Args:
             size: Crosshair size
+            scale: Resolution multiplier for line and dot thickness
         
         Returns:
             PIL Image
@@ -337,76 +1102,97 @@ class AssetGenerator:
         
         center = size // 2
         line_length = size // 3
-        line_width = 2
+        half_width = scale
+        # Rectangle corners are inclusive pixels: at scale N a 1x end pixel ends N - 1 further
+        end = center + scale - 1
         
         # Vertical line
         draw.rectangle(
-            [(center - 1, center - line_length),
-             (center + 1, center + line_length)],
+            [(center - half_width, center - line_length),
+             (end + half_width, end + line_length)],
             fill=self.colors.WHITE
         )
         
         # Horizontal line
         draw.rectangle(
-            [(center - line_length, center - 1),
-             (center + line_length, center + 1)],
+            [(center - line_length, center - half_width),
+             (end + line_length, end + half_width)],
             fill=self.colors.WHITE
         )
         
         # Center dot (optional)
-        dot_size = 2
+        dot_size = 2 * scale
         draw.ellipse(
             [(center - dot_size, center - dot_size),
-             (center + dot_size, center + dot_size)],
+             (end + dot_size, end + dot_size)],
             fill=self.colors.RED
         )
         
         return img
     
-    def generate_tile(self, tile_type: str, size: int = 32) -> Image.Image:
+    def generate_tile(self, tile_type: str, size: int = 32, variant: int = 0,
+                      seed: int = 0, scale: int = 1) -> Image.Image:
         """
         Generate tileset tiles
         
         Args:
             tile_type: Type of tile (concrete, asphalt, grass, etc.)
             size: Tile size
+            variant: Variant index
+            seed: Base seed for variants
+            scale: Resolution multiplier; the tile is drawn at size // scale
+                and enlarged, so every scale shows the same pixels
         
         Returns:
             PIL Image
         """
-        img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        tile_colors = {
-            'concrete': (200, 200, 200),
-            'asphalt': (50, 50, 50),
-            'grass': (34, 139, 34),
-            'dirt': (139, 90, 43),
-            'wood': (160, 82, 45),
-        }
+        tiles = render_tile_variants(tile_type, size // scale, seed, variant, 1)
+        return Image.fromarray(enlarge(tiles, scale)[0])
+    
+    def generate_tileset_sheet(self, tile_type: str, count: int = 4, size: int = 32,
+                               seed: int = 0, scale: int = 1) -> Image.Image:
+        """
+        Generate a horizontal strip of tile variants rendered as one batch
         
-        color = tile_colors.get(tile_type, (100, 100, 100))
+        Args:
+            tile_type: Type of tile
+            count: Number of variants
+            size: Tile size
+            seed: Base seed for variants
+            scale: Resolution multiplier (see generate_tile)
         
-        # Base tile
-        draw.rectangle([(0, 0), (size - 1, size - 1)], fill=color, outline=(100, 100, 100))
+        Returns:
+            PIL Image (count * size x size)
+        """
+        tiles = enlarge(render_tile_variants(tile_type, size // scale, seed, 0, count), scale)
+        return Image.fromarray(tiles.transpose(1, 0, 2, 3).reshape(size, count * size, 4))
+    
+    def generate_terrain_tileset(self, count: int = 4, size: int = 32, seed: int = 0,
+                                 scale: int = 1) -> Image.Image:
+        """
+        Generate the map tileset: one row per terrain in TILE_STYLES order,
+        count seeded variants per row
         
-        # Add some texture variation
-        if tile_type == 'concrete':
-            # Crack pattern
-            draw.line([(5, 0), (10, size)], fill=(180, 180, 180), width=1)
-            draw.line([(size // 2, 5), (size // 2 + 10, size - 5)], fill=(180, 180, 180), width=1)
-        elif tile_type == 'grass':
-            # Grass tufts
-            for x in [8, 16, 24]:
-                for y in [8, 16, 24]:
-                    draw.line([(x, y), (x + 2, y - 3)], fill=(20, 100, 20), width=1)
+        Args:
+            count: Variants per terrain
+            size: Tile size
+            seed: Base seed for variants
+            scale: Resolution multiplier (see generate_tile)
         
-        return img
+        Returns:
+            PIL Image (count * size x terrains * size)
+        """
+        rows = [enlarge(render_tile_variants(tile_type, size // scale, seed, 0, count), scale)
+                for tile_type in TILE_STYLES]
+        tiles = np.stack(rows)
+        return Image.fromarray(tiles.transpose(0, 2, 1, 3, 4).reshape(len(rows) * size, count * size, 4))
     
     def generate_muzzle_flash(self, frame_num: int = 1, size: int = 16) -> Image.Image:
         """
         Generate muzzle flash animation frame
         
+        Samples the 'muzzle_flash' keyframes at three evenly spaced times.
+        
         Args:
             frame_num: Animation frame (1-3)
             size: Flash size
@@ -414,43 +1200,45 @@ class AssetGenerator:
         Returns:
             PIL Image
         """
-        img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+        channels = sample_keyframes(ANIMATIONS['muzzle_flash']['keys'], 3,
+                                    defaults=ANIMATION_RENDERERS['flash'][1])
+        return self.draw_flash(size, **{name: values[frame_num - 1] for name, values in channels.items()})
+    
+    def draw_flash(self, size: int, scale: float = 1.0, rotation: float = 0.0,
+                   intensity: float = 1.0) -> Image.Image:
+        """
+        Draw a four-spiked flash
         
-        # Intensity varies by frame
-        intensity = max(50, 200 - (frame_num * 50))
+        Args:
+            size: Image size
+            scale: Spike length as a fraction of half the size (0 = nothing)
+            rotation: Rotation in degrees
+            intensity: 0 (orange) .. 1 (yellow)
         
-        # Yellow-orange flash
-        flash_color = (255, intensity, 50)
+        Returns:
+            PIL Image
+        """
+        img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        if scale <= 0:
+            return img
+        draw = ImageDraw.Draw(img)
         
-        # Different shapes for each frame
-        if frame_num == 1:
-            # Large burst
-            draw.polygon(
-                [(0, size//2), (size//2, 0), (size, size//2), (size//2, size)],
-                fill=flash_color
-            )
-        elif frame_num == 2:
-            # Medium burst
-            draw.ellipse(
-                [(2, 2), (size - 2, size - 2)],
-                fill=flash_color
-            )
-        else:
-            # Small tail
-            draw.polygon(
-                [(size//4, size//2), (size//2, size//4), (3*size//4, size//2)],
-                fill=flash_color
-            )
+        # Long spikes alternate with short ones
+        center = (size - 1) / 2
+        angles = np.radians(rotation + np.arange(8) * 45)
+        radii = np.where(np.arange(8) % 2 == 0, 1.0, 0.45) * scale * size / 2
+        points = list(zip(center + radii * np.cos(angles), center + radii * np.sin(angles)))
+        draw.polygon(points, fill=(255, int(50 + 150 * intensity), 50))
         
         return img
     
-    def generate_emblem(self, size: int = 256) -> Image.Image:
+    def generate_emblem(self, size: int = 256, scale: int = 1) -> Image.Image:
         """
         Generate VITYAZ unit emblem
         
         Args:
             size: Emblem size
+            scale: Resolution multiplier for pixel offsets and line widths
         
         Returns:
             PIL Image
@@ -468,7 +1256,8 @@ class AssetGenerator:
         draw.rectangle(
             [(shield_left, shield_top), (shield_right, shield_bottom)],
             fill=self.colors.KRAPOVY_MAROON,
-            outline=self.colors.GOLD_ACCENT
+            outline=self.colors.GOLD_ACCENT,
+            width=scale
         )
         
         # Sword (simplified)
@@ -478,7 +1267,7 @@ class AssetGenerator:
         
         # Blade
         draw.rectangle(
-            [(sword_x - 3, sword_top), (sword_x + 3, sword_bottom)],
+            [(sword_x - 3 * scale, sword_top), (sword_x + 3 * scale, sword_bottom)],
             fill=self.colors.LIGHT_GRAY
         )
         
@@ -502,133 +1291,1227 @@ class AssetGenerator:
             [(size//2 - border_radius, size//2 - border_radius),
              (size//2 + border_radius, size//2 + border_radius)],
             outline=self.colors.GOLD_ACCENT,
-            width=3
+            width=3 * scale
         )
         
         return img
     
-    # ==================== SPRITESHEET GENERATION ====================
+    # ==================== DECLARATIVE SPECS ====================
+    
+    def spec_ids(self, category: str) -> List[str]:
+        """Spec ids ("category/name") available for a category"""
+        return sorted(f"{category}/{path.stem}" for path in (self.spec_dir / category).glob("*.json"))
+    
+    def _spec_sources(self, spec_id: str) -> List[Tuple[Path, Dict[str, Any]]]:
+        """Raw spec documents from spec_id up its extends chain"""
+        chain = []
+        category = spec_id.split("/")[0]
+        while spec_id:
+            path = self.spec_dir / f"{spec_id}.json"
+            if any(path == seen for seen, _ in chain):
+                raise ValueError(f"Spec '{spec_id}' extends itself")
+            with open(path) as f:
+                raw = json.load(f)
+            chain.append((path, raw))
+            parent = raw.get("extends")
+            spec_id = parent if parent is None or "/" in parent else f"{category}/{parent}"
+        return chain
+    
+    def _resolve_color(self, value, colors: Dict[str, Any], spec_id: str) -> Tuple[int, ...]:
+        """Spec colour (palette name, spec colour name, #RRGGBB or RGB list) -> tuple"""
+        if isinstance(value, str):
+            if value in colors:
+                return self._resolve_color(colors[value], {}, spec_id)
+            if value.startswith("#") and len(value) == 7:
+                return tuple(int(value[i:i + 2], 16) for i in (1, 3, 5))
+            if value in ColorPalette.values():
+                return ColorPalette.values()[value]
+        elif isinstance(value, list) and len(value) in (3, 4):
+            return tuple(int(channel) for channel in value)
+        raise ValueError(f"Spec '{spec_id}': unknown colour {value!r}")
+    
+    @staticmethod
+    def _parse_coord(value, spec_id: str) -> Tuple[float, int]:
+        """Spec coordinate (fraction, or [fraction, pixel offset]) -> (fraction, offset)"""
+        if isinstance(value, (int, float)):
+            return float(value), 0
+        if isinstance(value, list) and len(value) == 2:
+            return float(value[0]), int(value[1])
+        raise ValueError(f"Spec '{spec_id}': bad coordinate {value!r}")
+    
+    def load_spec(self, spec_id: str) -> Dict[str, Any]:
+        """
+        Load a spec, resolve extends/colours and normalize its layers
+        
+        Parsed specs are kept until one of their files changes.
+        
+        Args:
+            spec_id: "category/name"
+        
+        Returns:
+            {"label", "size", "layers": [[shape, points, options], ...]} where
+            points are ((fx, ox), (fy, oy)) pairs and colours are RGB tuples
+        """
+        stamps = None
+        entry = self._specs.get(spec_id)
+        if entry is not None:
+            stamps = [path.stat().st_mtime_ns for path in entry["paths"]]
+            if stamps == entry["stamps"]:
+                return entry["spec"]
+        
+        chain = self._spec_sources(spec_id)
+        merged: Dict[str, Any] = {"colors": {}}
+        for _, raw in reversed(chain):
+            colors = dict(merged["colors"], **raw.get("colors", {}))
+            merged.update(raw)
+            merged["colors"] = colors
+        
+        if "size" not in merged or not merged.get("layers"):
+            raise ValueError(f"Spec '{spec_id}' needs a size and at least one layer")
+        
+        layers = []
+        for layer in merged["layers"]:
+            shape = layer.get("shape")
+            if shape not in SPEC_SHAPES:
+                raise ValueError(f"Spec '{spec_id}': unknown shape {shape!r}")
+            points = tuple(
+                (self._parse_coord(x, spec_id), self._parse_coord(y, spec_id))
+                for x, y in layer["points"]
+            )
+            options = {}
+            for key in ("fill", "outline"):
+                if key in layer:
+                    options[key] = self._resolve_color(layer[key], merged["colors"], spec_id)
+            if "width" in layer:
+                options["width"] = int(layer["width"])
+            layers.append((shape, points, options))
+        
+        spec = {
+            "label": merged.get("label", spec_id),
+            "size": tuple(merged["size"]),
+            "layers": layers,
+        }
+        paths = [path for path, _ in chain]
+        self._specs[spec_id] = {
+            "paths": paths,
+            "stamps": [path.stat().st_mtime_ns for path in paths],
+            "spec": spec,
+            "plans": {},
+        }
+        return spec
     
-    def create_spritesheet(self, frames: List[Image.Image], cols: int, rows: int,
-                          output_path: str, frame_width: int, frame_height: int):
+    def compile_spec(self, spec_id: str, size: Tuple[int, int],
+                     scale: int = 1) -> List[Tuple[str, List, Dict]]:
         """
-        Combine multiple frames into a spritesheet
+        Project a spec's normalized layers to pixel coordinates
+        
+        The parsed layers are shared by every size and scale; only this
+        projection is per target, and it is cached so repeated renders just
+        replay it.
         
         Args:
-            frames: List of PIL Images
-            cols: Number of columns
-            rows: Number of rows
-            output_path: Output file path
-            frame_width: Width of each frame
-            frame_height: Height of each frame
+            spec_id: "category/name"
+            size: Target (width, height)
+            scale: Multiplier for pixel offsets and line widths
+        
+        Returns:
+            Flat list of (ImageDraw method, xy, keyword arguments)
         """
-        sheet_width = frame_width * cols
-        sheet_height = frame_height * rows
-        spritesheet = Image.new('RGBA', (sheet_width, sheet_height), (0, 0, 0, 0))
+        self.load_spec(spec_id)
+        plans = self._specs[spec_id]["plans"]
+        plan_key = (tuple(size), scale)
+        if plan_key not in plans:
+            width, height = size
+            plan = []
+            for shape, points, options in self._specs[spec_id]["spec"]["layers"]:
+                xy = [(int(width * fx) + ox * scale, int(height * fy) + oy * scale)
+                      for (fx, ox), (fy, oy) in points]
+                if "width" in options:
+                    options = dict(options, width=options["width"] * scale)
+                plan.append((shape, xy, options))
+            plans[plan_key] = plan
+        return plans[plan_key]
+    
+    def render_spec(self, spec: str, size: Optional[Tuple[int, int]] = None,
+                    scale: int = 1) -> Image.Image:
+        """
+        Render a declarative spec by replaying its compiled plan
+        
+        Args:
+            spec: Spec id ("category/name")
+            size: Sprite dimensions (width, height); defaults to the spec's size
+            scale: Resolution multiplier for pixel offsets and line widths
         
-        for idx, frame in enumerate(frames):
-            if idx >= cols * rows:
-                break
+        Returns:
+            PIL Image
+        """
+        size = tuple(size or self.load_spec(spec)["size"])
+        img = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        for shape, xy, options in self.compile_spec(spec, size, scale):
+            getattr(draw, shape)(xy, **options)
+        return img
+    
+    # ==================== ANIMATION ====================
+    
+    def render_flash_frames(self, size: Tuple[int, int],
+                            channels: Dict[str, np.ndarray]) -> List[Image.Image]:
+        """Render flash frames (channels: scale, rotation, intensity)"""
+        return [self.draw_flash(size[0], channels['scale'][idx], channels['rotation'][idx],
+                                channels['intensity'][idx])
+                for idx in range(len(channels['scale']))]
+    
+    def render_operator_frames(self, size: Tuple[int, int], channels: Dict[str, np.ndarray],
+                               weapon: bool = False, scale: int = 1) -> List[Image.Image]:
+        """
+        Render operator poses
+        
+        The body, rifle and flashes are drawn once per animation and pasted;
+        only legs and arms are drawn per frame. Channels are fractions of the
+        frame size: bob (body raised, negative = up), stride (-1..1, which
+        foot is lifted), arm (-1..1, which hand is raised), recoil (body
+        pushed back) and flash (muzzle flash scale, 0 = none).
+        
+        Args:
+            size: Frame (width, height); the body takes the top width x width
+            channels: Per-frame channel values
+            weapon: Hold the AK-74M across the chest
+            scale: Resolution multiplier; poses are drawn at size // scale and
+                enlarged, so limbs and line weights match 1x at every scale
+        
+        Returns:
+            PIL Images
+        """
+        if scale != 1:
+            frames = self.render_operator_frames((size[0] // scale, size[1] // scale), channels, weapon)
+            return [Image.fromarray(enlarge(np.asarray(frame), scale)) for frame in frames]
+        width, height = size
+        body = self.node_image("generate_vityaz_operator", size=width)
+        rifle = self.node_image("generate_ak74m_sprite", size=(width * 3 // 4, width * 3 // 8)) if weapon else None
+        flashes: Dict[float, Image.Image] = {}
+        
+        limb = max(2, width // 8)
+        boot = max(2, height // 24)
+        ground = height - boot - 1
+        hips = (int(width * 0.38), int(width * 0.62))
+        shoulders = (int(width * 0.2), int(width * 0.8))
+        
+        frames = []
+        for idx in range(len(channels['bob'])):
+            bob = round(channels['bob'][idx] * height)
+            back = round(channels['recoil'][idx] * width)
+            lift = channels['stride'][idx] * height * 0.08
+            raise_hand = channels['arm'][idx] * width * 0.15
             
-            col = idx % cols
-            row = idx // cols
-            x = col * frame_width
-            y = row * frame_height
+            img = Image.new('RGBA', size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(img)
             
-            spritesheet.paste(frame, (x, y), frame)
+            # Legs behind the body; the lifted foot alternates with stride
+            for hip_x, foot_lift in zip(hips, (max(lift, 0), max(-lift, 0))):
+                foot_y = ground - round(foot_lift)
+                draw.line([(hip_x - back, width - limb + bob), (hip_x - back, foot_y)],
+                          fill=self.colors.MILITARY_GREEN, width=limb)
+                draw.rectangle([(hip_x - back - limb // 2, foot_y),
+                                (hip_x - back + limb, foot_y + boot)],
+                               fill=self.colors.TACTICAL_BLACK)
+            
+            with self.tracer.span("composite"):
+                img.paste(body, (-back, bob), body)
+            
+            # Arms, the raised hand alternating opposite the lifted foot
+            for shoulder_x, hand_raise in zip(shoulders, (max(raise_hand, 0), max(-raise_hand, 0))):
+                top = int(width * 0.5) + bob
+                hand_y = top + int(width * 0.35) - round(hand_raise)
+                draw.line([(shoulder_x - back, top), (shoulder_x - back, hand_y)],
+                          fill=self.colors.MILITARY_GREEN, width=max(2, width // 10))
+                draw.rectangle([(shoulder_x - back - 1, hand_y), (shoulder_x - back + 1, hand_y + 2)],
+                               fill=(220, 180, 140))
+            
+            if rifle is not None:
+                rifle_x = (width - rifle.width) // 2 - back
+                rifle_y = int(width * 0.62) + bob
+                with self.tracer.span("composite"):
+                    img.paste(rifle, (rifle_x, rifle_y), rifle)
+                strength = round(float(channels['flash'][idx]), 3)
+                if strength > 0:
+                    if strength not in flashes:
+                        flashes[strength] = self.draw_flash(rifle.height, strength, 0.0, strength)
+                    flash = flashes[strength]
+                    with self.tracer.span("composite"):
+                        img.paste(flash, (rifle_x + rifle.width - flash.width // 4,
+                                          rifle_y + (rifle.height - flash.height) // 2), flash)
+            
+            frames.append(img)
+        return frames
+    
+    def render_animation(self, name: str, scale: int = 1) -> List[Image.Image]:
+        """
+        Interpolate an animation's keyframes and render all of its frames
         
-        spritesheet.save(output_path)
-        print(f"✅ Spritesheet saved: {output_path}")
+        Args:
+            name: Key in ANIMATIONS
+            scale: Resolution factor
+        
+        Returns:
+            PIL Images, one per frame
+        """
+        spec = ANIMATIONS[name]
+        method, defaults = ANIMATION_RENDERERS[spec['renderer']]
+        channels = sample_keyframes(spec['keys'], spec['frames'], spec.get('loop', False), defaults)
+        size = tuple(side * scale for side in spec['size'])
+        options = dict(spec.get('options', {}))
+        # Renderers with pixel-sized details take the factor (see render_operator_frames)
+        if 'scale' in inspect.signature(getattr(self, method)).parameters:
+            options['scale'] = scale
+        return getattr(self, method)(size, channels, **options)
     
-    # ==================== GENERATION COMMANDS ====================
+    def generate_animations(self):
+        """
+        Render every animation and pack its distinct frames into a sheet
+        
+        Frames equal to an earlier one (within frame_tolerance) are stored
+        once; the atlas frame table lists every frame, the repeats pointing
+        at the stored copy, and meta.animation holds the Phaser playback
+        order, frame rate and repeat.
+        """
+        print("\n🎞️ Rendering animations...")
+        with self.batched_pages():
+            for name, spec in ANIMATIONS.items():
+                for factor in self.scales:
+                    self.tracer.asset = name
+                    with self.tracer.span("draw", name):
+                        images = self.render_animation(name, factor)
+                    unique, mapping = dedupe_frames([np.asarray(image.convert('RGBA')) for image in images],
+                                                    self.frame_tolerance)
+                    
+                    frame_names = [f"{name}_{idx:02d}" for idx in range(len(images))]
+                    path = Path(spec['path'])
+                    if self.scales != (1,):
+                        path = path.with_name(f"{path.stem}@{factor}x{path.suffix}")
+                    self.create_spritesheet(
+                        {frame_names[idx]: images[idx] for idx in unique},
+                        str(self.output_dir / path),
+                        padding=self.atlas_padding,
+                        max_size=self.atlas_max_size,
+                        scale=factor,
+                        aliases={frame_names[idx]: frame_names[stored]
+                                 for idx, stored in enumerate(mapping) if stored != idx},
+                        animation={"key": name, "frames": frame_names,
+                                   "frameRate": spec['frame_rate'], "repeat": spec['repeat']},
+                        trim=self.trim
+                    )
+                    print(f"   {name}: {len(images)} frames, {len(unique)} stored")
+    
+    # ==================== MAPS ====================
+    
+    def tiled_tileset(self, tile_size: int = 32) -> Dict[str, Any]:
+        """
+        Tiled tileset entry for the terrain tileset, relative to maps/
+        
+        With --scales the image is the smallest scale written (terrain@1x.png
+        for 1,2,4), and tile_size is multiplied to match it.
+        """
+        job = next(job for job in self.tileset_jobs() if job.method == "generate_terrain_tileset")
+        if self.scales != (1,):
+            job = self.scale_job(job, self.scales[0])
+            tile_size *= self.scales[0]
+        columns = self.tile_variants
+        return {
+            "firstgid": 1,
+            "name": "terrain",
+            "image": Path(job.path).relative_to("maps").as_posix(),
+            "imagewidth": columns * tile_size,
+            "imageheight": len(TILE_STYLES) * tile_size,
+            "tilewidth": tile_size,
+            "tileheight": tile_size,
+            "columns": columns,
+            "tilecount": columns * len(TILE_STYLES),
+            "margin": 0,
+            "spacing": 0,
+            "tiles": [
+                {"id": row * columns + variant,
+                 "properties": [{"name": "terrain", "type": "string", "value": tile_type}]}
+                for row, tile_type in enumerate(TILE_STYLES) for variant in range(columns)
+            ],
+        }
+    
+    def map_chunk_gids(self, name: str, x0: int, y0: int, width: int, height: int) -> np.ndarray:
+        """
+        Tile GIDs of one map region (terrain row plus a hashed variant)
+        
+        Args:
+            name: Key in MAP_PRESETS
+            x0, y0: Top-left tile
+            width, height: Region size in tiles
+        
+        Returns:
+            (height, width) uint32 GIDs for tiled_tileset()
+        """
+        rules = dict(MAP_RULES, **MAP_PRESETS[name])
+        seed = self.tile_seed * 1000003 + zlib.crc32(name.encode())
+        terrain = map_chunk_terrain(x0, y0, width, height, seed, rules)
+        y, x = np.mgrid[y0:y0 + height, x0:x0 + width]
+        variant = (hash_unit(seed + 303, x, y) * self.tile_variants).astype(np.int64)
+        return (1 + terrain * self.tile_variants + variant).astype(np.uint32)
+    
+    def write_map(self, name: str, width: int, height: int, chunk: int = 16) -> Tuple[Path, int]:
+        """
+        Stream a procedural map to disk one chunk at a time
+        
+        Writes maps/NAME.json, a Tiled infinite map whose chunks are
+        uncompressed base64 (Phaser 3 skips compressed layers), and
+        maps/NAME/X_Y.json, one Tiled chunk object
+        per chunk (plain data array, X/Y in tiles) for loading on demand.
+        Only one chunk is held in memory, whatever the map size; chunk files
+        no longer part of the map are removed.
+        
+        Args:
+            name: Key in MAP_PRESETS
+            width, height: Map size in tiles
+            chunk: Chunk side in tiles
+        
+        Returns:
+            (map JSON path, number of chunks)
+        """
+        map_path = self.output_dir / "maps" / f"{name}.json"
+        chunk_dir = map_path.with_suffix('')
+        chunk_dir.mkdir(parents=True, exist_ok=True)
+        
+        placeholder = "@CHUNKS@"
+        tileset = self.tiled_tileset()
+        document = {
+            "type": "map", "version": "1.10", "tiledversion": "1.10.2",
+            "orientation": "orthogonal", "renderorder": "right-down", "infinite": True,
+            "width": width, "height": height,
+            "tilewidth": tileset["tilewidth"], "tileheight": tileset["tileheight"],
+            "nextlayerid": 2, "nextobjectid": 1, "compressionlevel": -1,
+            "layers": [{
+                "id": 1, "name": "terrain", "type": "tilelayer", "visible": True, "opacity": 1,
+                "x": 0, "y": 0, "startx": 0, "starty": 0, "width": width, "height": height,
+                "encoding": "base64", "chunks": placeholder,
+            }],
+            "tilesets": [tileset],
+            "properties": [
+                {"name": "chunkSize", "type": "int", "value": chunk},
+                {"name": "chunkPath", "type": "string", "value": f"{name}/{{x}}_{{y}}.json"},
+            ],
+        }
+        head, tail = json.dumps(document).split(f'"{placeholder}"')
+        
+        tmp_path = map_path.with_name(map_path.name + ".tmp")
+        written = set()
+        with open(tmp_path, 'w') as f:
+            f.write(head + "[")
+            for y0 in range(0, height, chunk):
+                for x0 in range(0, width, chunk):
+                    with self.tracer.span("draw", f"maps/{name}"):
+                        gids = self.map_chunk_gids(name, x0, y0, min(chunk, width - x0),
+                                                   min(chunk, height - y0))
+                    bounds = {"x": x0, "y": y0, "width": gids.shape[1], "height": gids.shape[0]}
+                    encoded = base64.b64encode(gids.astype('<u4').tobytes()).decode()
+                    f.write(("," if written else "") + json.dumps(dict(bounds, data=encoded)))
+                    
+                    chunk_path = chunk_dir / f"{x0}_{y0}.json"
+                    with self.tracer.span("write", f"maps/{name}"):
+                        write_if_changed(chunk_path, json.dumps(
+                            dict(bounds, data=gids.ravel().tolist()), separators=(',', ':')).encode())
+                    written.add(chunk_path.name)
+            f.write("]" + tail + "\n")
+        
+        # Keep the old file (and its mtime) when nothing changed
+        if map_path.exists() and filecmp.cmp(tmp_path, map_path, shallow=False):
+            tmp_path.unlink()
+        else:
+            os.replace(tmp_path, map_path)
+        for stale in chunk_dir.glob("*.json"):
+            if stale.name not in written:
+                stale.unlink()
+        return map_path, len(written)
+    
+    def generate_maps(self):
+        """Generate every map in MAP_PRESETS at map_size"""
+        print("\n🗺️ Generating maps...")
+        width, height = self.map_size
+        for name in MAP_PRESETS:
+            map_path, chunks = self.write_map(name, width, height, self.map_chunk)
+            print(f"✅ Map saved: {map_path} ({width}x{height} tiles, {chunks} chunks)")
     
-    def generate_character_sprites(self):
-        """Generate all character sprites"""
-        print("\n🧑 Generating character sprites...")
-        
-        # Operator head
-        head = self.generate_vityaz_head(64)
-        head.save(str(self.output_dir / "sprites/characters/head_krapovy.png"))
-        print("✅ Head sprite generated")
-        
-        # Operator torso
-        torso = self.generate_vityaz_torso(64)
-        torso.save(str(self.output_dir / "sprites/characters/torso_assault.png"))
-        print("✅ Torso sprite generated")
-        
-        # Combined operator (32x64 full body)
-        full_body = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
-        full_body.paste(head, (0, 0), head)
-        full_body.paste(torso, (0, 20), torso)
-        full_body.save(str(self.output_dir / "sprites/characters/vityaz_operator.png"))
-        print("✅ Full operator sprite generated")
-    
-    def generate_weapon_sprites(self):
-        """Generate weapon sprites"""
-        print("\n🔫 Generating weapon sprites...")
-        
-        # AK-74M
-        ak74m = self.generate_ak74m_sprite((32, 16))
-        ak74m.save(str(self.output_dir / "sprites/weapons/ak74m.png"))
-        print("✅ AK-74M generated")
-        
-        # SVD Dragunov (longer, thinner)
-        svd = self.generate_ak74m_sprite((48, 12))
-        svd.save(str(self.output_dir / "sprites/weapons/svd.png"))
-        print("✅ SVD Dragunov generated")
-        
-        # PMM Makarov (compact)
-        pmm = self.generate_ak74m_sprite((16, 12))
-        pmm.save(str(self.output_dir / "sprites/weapons/pmm.png"))
-        print("✅ PMM Makarov generated")
-    
-    def generate_ui_elements(self):
-        """Generate UI elements"""
-        print("\n🖥️ Generating UI elements...")
-        
-        # Emblem
-        emblem = self.generate_emblem(256)
-        emblem.save(str(self.output_dir / "ui/vityaz_emblem.png"))
-        print("✅ Emblem generated")
-        
-        # Health bar
-        health_bar = self.generate_health_bar(200, 20)
-        health_bar.save(str(self.output_dir / "ui/hud/health_bar.png"))
-        print("✅ Health bar generated")
-        
-        # Crosshair
-        crosshair = self.generate_crosshair(32)
-        crosshair.save(str(self.output_dir / "ui/hud/crosshair.png"))
-        print("✅ Crosshair generated")
-    
-    def generate_tilesets(self):
-        """Generate tileset tiles"""
-        print("\n🗺️ Generating tilesets...")
-        
-        tile_types = ['concrete', 'asphalt', 'grass', 'dirt', 'wood']
-        
-        for tile_type in tile_types:
-            # Create 4 variations
-            tiles = []
-            for var in range(4):
-                tile = self.generate_tile(tile_type, 32)
-                tiles.append(tile)
+    # ==================== SPRITESHEET GENERATION ====================
+    
+    def create_spritesheet(self, frames, output_path: str, padding: int = 2,
+                           power_of_two: bool = True, max_size: int = 2048,
+                           scale: int = 1, aliases: Optional[Dict[str, str]] = None,
+                           animation: Optional[Dict[str, Any]] = None,
+                           trim: bool = True) -> List[Path]:
+        """
+        Pack frames of any size into texture atlas pages
+        
+        Writes a PNG and a Phaser 3 JSON-hash atlas per page. When frames
+        spill over several pages, pages are suffixed -0, -1, ... and a
+        Phaser multiatlas JSON is written at output_path as well.
+        
+        Frames are trimmed to their opaque bounding box, with the offset and
+        original size kept in spriteSourceSize/sourceSize so Phaser places
+        them unchanged. Frames with identical pixels are packed once and
+        share a rect.
+        
+        Args:
+            frames: Dict of frame name -> PIL Image, or list of PIL Images
+            output_path: Output PNG path
+            padding: Transparent pixels between frames
+            power_of_two: Restrict page sides to powers of two
+            max_size: Maximum page width and height
+            scale: Resolution scale recorded in the atlas meta
+            aliases: Extra frame names -> packed frame they reuse (same rect)
+            animation: Playback info recorded as meta.animation
+            trim: Trim transparent borders
+        
+        Returns:
+            Paths written
+        """
+        if not isinstance(frames, dict):
+            frames = {f"frame_{idx:03d}": frame for idx, frame in enumerate(frames)}
+        
+        output_path = Path(output_path)
+        atlas_name = output_path.name
+        
+        # Frame name -> (packed frame name, offset in source, source size)
+        sources: Dict[str, Tuple[str, Tuple[int, int], Tuple[int, int]]] = {}
+        packed: Dict[str, Image.Image] = {}
+        by_digest: Dict[bytes, str] = {}
+        for name, frame in frames.items():
+            frame = frame.convert('RGBA')
+            source_size = frame.size
+            offset = (0, 0)
+            if trim:
+                with self.tracer.span("trim", atlas_name):
+                    frame, offset = trim_transparent(frame)
+            digest = hashlib.blake2b(repr(frame.size).encode() + frame.tobytes(), digest_size=16).digest()
+            stored = by_digest.setdefault(digest, name)
+            if stored == name:
+                packed[name] = frame
+            sources[name] = (stored, offset, source_size)
+        for alias, target in (aliases or {}).items():
+            sources[alias] = sources[target]
+        
+        rects = [(name, frame.width + padding, frame.height + padding)
+                 for name, frame in packed.items()]
+        with self.tracer.span("pack", atlas_name):
+            pages = plan_atlas_pages(rects, max_size, power_of_two)
+        
+        written = []
+        textures = []
+        page_jobs = []
+        for page_num, ((page_width, page_height), placements) in enumerate(pages):
+            if len(pages) == 1:
+                image_path = output_path
+            else:
+                image_path = output_path.with_name(f"{output_path.stem}-{page_num}{output_path.suffix}")
+            page = Image.new('RGBA', (page_width, page_height), (0, 0, 0, 0))
+            for name, frame in packed.items():
+                if name in placements:
+                    with self.tracer.span("composite", atlas_name):
+                        page.paste(frame, placements[name], frame)
+            
+            frame_table = {}
+            for name, (stored, (offset_x, offset_y), (source_w, source_h)) in sources.items():
+                if stored not in placements:
+                    continue
+                x, y = placements[stored]
+                frame = packed[stored]
+                frame_table[name] = {
+                    "frame": {"x": x, "y": y, "w": frame.width, "h": frame.height},
+                    "rotated": False,
+                    "trimmed": frame.size != (source_w, source_h),
+                    "spriteSourceSize": {"x": offset_x, "y": offset_y, "w": frame.width, "h": frame.height},
+                    "sourceSize": {"w": source_w, "h": source_h},
+                }
+            
+            meta = {
+                "app": "VITYAZ graphics-generator",
+                "version": "1.0",
+                "image": image_path.name,
+                "format": "RGBA8888",
+                "size": {"w": page_width, "h": page_height},
+                "scale": str(scale),
+            }
+            if animation:
+                meta["animation"] = animation
+            atlas = {"frames": frame_table, "meta": meta}
+            json_path = image_path.with_suffix('.json')
+            
+            page_jobs.append((atlas_name, image_path, page, json_path,
+                              (json.dumps(atlas, indent=2) + "\n").encode()))
+            written += [image_path, json_path]
+            
+            textures.append(dict(meta, frames=[
+                dict(entry, filename=name) for name, entry in frame_table.items()
+            ]))
+            stored_count = sum(name in placements for name in packed)
+            print(f"✅ Atlas page saved: {image_path} ({page_width}x{page_height}, "
+                  f"{len(frame_table)} frames, {stored_count} packed)")
+        
+        if len(pages) > 1:
+            multiatlas = {"textures": textures, "meta": {"app": "VITYAZ graphics-generator",
+                                                         "version": "1.0"}}
+            json_path = output_path.with_suffix('.json')
+            write_if_changed(json_path, (json.dumps(multiatlas, indent=2) + "\n").encode())
+            written.append(json_path)
+        
+        if self._pending_pages is not None:
+            self._pending_pages += page_jobs
+        else:
+            self.write_pages(page_jobs)
+        return written
+    
+    @contextlib.contextmanager
+    def batched_pages(self):
+        """Encode the pages of every spritesheet created inside the block together, across the pool"""
+        self._pending_pages = []
+        try:
+            yield
+            self.write_pages(self._pending_pages)
+        finally:
+            self._pending_pages = None
+    
+    def encode_page(self, page_job: Tuple[str, Path, Image.Image, Path, bytes]) -> Tuple[bytes, Dict[str, Any]]:
+        """Encode one atlas page (see write_pages)"""
+        self.tracer.asset = page_job[0]
+        return self.encode_image(page_job[2])
+    
+    def write_pages(self, page_jobs: List[Tuple[str, Path, Image.Image, Path, bytes]]):
+        """
+        Encode atlas pages and write them with their atlas JSON
+        
+        Args:
+            page_jobs: (atlas name, image path, page image, JSON path, JSON bytes) per page
+        """
+        for (atlas_name, image_path, _, json_path, atlas_json), (data, info) in zip(
+                page_jobs, self.parallel_map(type(self).encode_page, page_jobs)):
+            with self.tracer.span("write", atlas_name):
+                self.write_encoded(image_path, data, info)
+                write_if_changed(json_path, atlas_json)
+    
+    # ==================== BUILD PIPELINE ====================
+    
+    def fingerprint(self, method: str) -> str:
+        """
+        Hash the source of a generator method and everything it calls
+        
+        Follows names referenced from the method's code to other methods of
+        this class, to functions/classes defined in this module and to
+        module-level constants, so a composite asset is invalidated when any
+        of its parts change.
+        
+        Args:
+            method: AssetGenerator method name
+        
+        Returns:
+            Hex digest
+        """
+        if method in self._fingerprints:
+            return self._fingerprints[method]
+        
+        # Code in this file and in asset_common (encoders, palette) is followed
+        own_modules = {type(self).__module__, asset_common.__name__}
+        seen = set()
+        sources = []
+        pending = [getattr(type(self), method)]
+        
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            sources.append(inspect.getsource(obj))
+            module_globals = sys.modules[obj.__module__].__dict__
             
-            # Save individual tiles
-            for idx, tile in enumerate(tiles):
-                tile.save(str(self.output_dir / f"maps/tilesets/tile_{tile_type}_{idx}.png"))
+            codes = [obj.__code__] if isinstance(obj, types.FunctionType) else [
+                member.__code__ for member in vars(obj).values()
+                if isinstance(member, types.FunctionType)
+            ]
+            while codes:
+                code = codes.pop()
+                codes.extend(c for c in code.co_consts if isinstance(c, types.CodeType))
+                # Methods named in strings, e.g. node_image("generate_vityaz_head", ...)
+                pending.extend(getattr(type(self), c) for c in code.co_consts
+                               if isinstance(c, str) and isinstance(getattr(type(self), c, None), types.FunctionType))
+                for name in code.co_names:
+                    target = getattr(type(self), name, None)
+                    if not isinstance(target, types.FunctionType):
+                        target = module_globals.get(name)
+                    if (isinstance(target, (types.FunctionType, type))
+                            and getattr(target, '__module__', None) in own_modules):
+                        pending.append(target)
+                    elif isinstance(target, (dict, list, tuple, str, int, float)):
+                        sources.append(f"{name} = {target!r}")
+        
+        digest = hashlib.sha256("\n".join(sorted(set(sources))).encode()).hexdigest()
+        self._fingerprints[method] = digest
+        return digest
+    
+    def cache_key(self, job: AssetJob) -> str:
+        """Cache key covering everything that determines a job's output bytes"""
+        material = {
+            "method": job.method,
+            "params": job.params,
+            "code": self.fingerprint(job.method),
+            "palette": ColorPalette.values(),
+        }
+        if "spec" in job.params:
+            material["spec"] = self.load_spec(job.params["spec"])
+        material["encoder"] = {"code": self.fingerprint("encode_image"),
+                                "indexed": self.indexed, "webp": self.webp}
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+    
+    def encode_image(self, image: Image.Image) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Encode an image losslessly, keeping the smallest encoding
+        
+        The PNG (optimized RGBA, or indexed when that is smaller) is always
+        kept as the universally supported file; lossless WebP is kept as an
+        alternate when it beats it.
+        
+        Args:
+            image: Image to encode
+        
+        Returns:
+            (PNG bytes, info with "format", the plain RGBA size "rgba_bytes",
+            bytes per tried encoding "sizes" and smaller "alternates" by format)
+        """
+        with self.tracer.span("encode"):
+            data = encode_png(image)
+        info = {"format": "png", "rgba_bytes": len(data), "sizes": {"png": len(data)}}
+        if self.indexed:
+            with self.tracer.span("quantize"):
+                indexed = quantize_indexed(image)
+            if indexed is not None:
+                with self.tracer.span("encode"):
+                    indexed_data = encode_png(indexed)
+                info["sizes"]["png-indexed"] = len(indexed_data)
+                if len(indexed_data) < len(data):
+                    data = indexed_data
+                    info["format"] = "png-indexed"
+        if self.webp:
+            with self.tracer.span("encode"):
+                webp_data = encode_webp(image)
+            info["sizes"]["webp"] = len(webp_data)
+            if len(webp_data) < len(data):
+                info["alternates"] = {"webp": webp_data}
+        return data, info
+    
+    def write_encoded(self, path: Path, data: bytes, info: Dict[str, Any]):
+        """Write an asset's PNG and its smaller alternates; remove alternates that no longer win"""
+        write_if_changed(path, data)
+        alternates = info.get("alternates", {})
+        for fmt in ALTERNATE_FORMATS:
+            alternate_path = path.with_suffix(f".{fmt}")
+            if fmt in alternates:
+                write_if_changed(alternate_path, alternates[fmt])
+            elif alternate_path.exists():
+                alternate_path.unlink()
+    
+    def node_image(self, method: str, **params) -> Image.Image:
+        """
+        Image of a graph node, rendered at most once per build
+        
+        Every consumer of the same (method, parameters) gets the same image,
+        so treat it as read-only.
+        
+        Args:
+            method: Generator method
+            **params: Its parameters
+        
+        Returns:
+            PIL Image
+        """
+        key = node_key(method, params)
+        image = self._images.get(key)
+        if image is None:
+            image = self._images[key] = getattr(self, method)(**params)
+        return image
+    
+    def render_inputs(self, jobs: List[AssetJob]):
+        """Render the declared inputs of jobs, depth first, into the per-build image store"""
+        for job in jobs:
+            for node in job.inputs:
+                self.render_inputs([node])
+                self.tracer.asset = node.path
+                with self.tracer.span("draw"):
+                    self.node_image(node.method, **node.params)
+    
+    def render_job(self, job: AssetJob) -> Tuple[bytes, Dict[str, Any]]:
+        """Render a job and encode it"""
+        self.tracer.asset = job.path
+        with self.tracer.span("draw"):
+            image = self.node_image(job.method, **job.params)
+        return self.encode_image(image)
+    
+    def render_jobs(self, jobs: List[AssetJob]) -> List[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Render jobs, across a process pool when more than one worker is set
+        
+        Args:
+            jobs: Jobs to render
+        
+        Returns:
+            (encoded bytes, encoder info) per job
+        """
+        return self.parallel_map(type(self).render_job, jobs)
+    
+    def parallel_map(self, task: Callable, items: List[Any]) -> List[Any]:
+        """
+        Call task(generator, item) for every item, across a process pool when
+        more than one worker is set
+        
+        Results come back in item order, so output is identical to a serial run.
+        
+        Args:
+            task: Generator method, e.g. AssetGenerator.render_job
+            items: Its arguments
+        
+        Returns:
+            Result per item
+        """
+        workers = min(self.jobs, len(items))
+        context = None
+        if type(self).__module__ != '__main__':
+            # Loaded from the file (--watch reloads): only forked workers can see the module,
+            # so without fork (Windows) render in this process
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            else:
+                workers = 1
+        if workers <= 1:
+            return [task(self, item) for item in items]
+        
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            for result, events in executor.map(_run_in_worker, [task] * len(items), items):
+                results.append(result)
+                if events:  # Always empty unless profiling
+                    self.tracer.events.extend(events)
+        return results
+    
+    def build_assets(self, jobs: List[AssetJob]) -> Dict[str, bytes]:
+        """
+        Render, encode and write jobs, skipping those already current
+        
+        Files whose bytes are unchanged are left untouched so their mtimes
+        do not move.
+        
+        Args:
+            jobs: Assets to build
+        
+        Returns:
+            Encoded bytes by output path
+        """
+        outputs: Dict[str, bytes] = {}
+        keys = [self.cache_key(job) for job in jobs]
+        results: Dict[str, Tuple[bytes, Dict[str, Any]]] = {}
+        cached = set()
+        pending: Dict[str, AssetJob] = {}
+        
+        for key, job in zip(keys, jobs):
+            if key in results or key in pending:
+                continue
+            with self.tracer.span("cache", job.path):
+                hit = self.cache.get(key) if self.cache else None
+            if hit is not None:
+                results[key] = hit
+                cached.add(key)
+            else:
+                pending[key] = job
+        
+        # Inputs are rendered here, only for jobs that missed the cache, so
+        # pool workers start with them instead of each drawing its own copy
+        self.render_inputs(list(pending.values()))
+        rendered = self.render_jobs(list(pending.values()))
+        for key, (data, info) in zip(pending, rendered):
+            results[key] = (data, info)
+            if self.cache:
+                self.cache.put(key, data, {name: value for name, value in info.items() if name != "alternates"},
+                               info.get("alternates"))
+        
+        for key, job in zip(keys, jobs):
+            data, info = results[key]
+            with self.tracer.span("write", job.path):
+                self.write_encoded(self.output_dir / job.path, data, info)
+            outputs[job.path] = data
             
-            print(f"✅ {tile_type.capitalize()} tiles generated")
+            notes = []
+            if key in cached:
+                notes.append("cached")
+            if info.get("format") == "png-indexed":
+                notes.append(f"indexed {info['rgba_bytes']} → {len(data)} B")
+            webp_data = info.get("alternates", {}).get("webp")
+            if webp_data is not None:
+                notes.append(f"webp {len(webp_data)} B")
+            self.encode_stats["assets"] += 1
+            self.encode_stats["indexed"] += info.get("format") == "png-indexed"
+            self.encode_stats["rgba_bytes"] += info.get("rgba_bytes", len(data))
+            self.encode_stats["bytes"] += len(data)
+            self.encode_stats["webp"] += webp_data is not None
+            self.encode_stats["smallest_bytes"] += len(data) if webp_data is None else len(webp_data)
+            suffix = f" ({', '.join(notes)})" if notes else ""
+            print(f"✅ {job.label}{suffix}")
+        
+        if self.cache:
+            self.cache.save()
+        
+        return outputs
     
-    def generate_effects(self):
-        """Generate visual effects"""
-        print("\n✨ Generating effects...")
+    def all_jobs(self) -> List[AssetJob]:
+        """Every asset in the catalogue"""
+        return (self.character_jobs() + self.weapon_jobs() + self.ui_jobs()
+                + self.tileset_jobs() + self.effect_jobs())
+    
+    def scale_job(self, job: AssetJob, factor: int) -> AssetJob:
+        """
+        Copy a job for rendering at factor x resolution as name@{factor}x.png
         
-        # Muzzle flash animation
-        for frame in range(1, 4):
-            flash = self.generate_muzzle_flash(frame, 16)
-            flash.save(str(self.output_dir / f"effects/particles/muzzle_flash_{frame:02d}.png"))
-        print("✅ Muzzle flash generated (3 frames)")
+        Args:
+            job: Job at 1x
+            factor: Scale factor
+        
+        Returns:
+            Scaled job
+        """
+        params = {}
+        for name, value in job.params.items():
+            if name in SCALABLE_PARAMS:
+                value = (tuple(v * factor for v in value)
+                         if isinstance(value, (tuple, list)) else value * factor)
+            params[name] = value
+        # Left out at 1x so the parameters match direct calls such as node_image(method, size=...)
+        if factor != 1 and 'scale' in inspect.signature(getattr(self, job.method)).parameters:
+            params['scale'] = factor
+        
+        path = Path(job.path)
+        scaled = AssetJob(str(path.with_name(f"{path.stem}@{factor}x{path.suffix}")),
+                          job.method, f"{job.label} @{factor}x",
+                          inputs=[self.scale_job(node, factor) for node in job.inputs], **params)
+        scaled.source_path = job.path
+        scaled.scale = factor
+        return scaled
+    
+    def with_scales(self, jobs: List[AssetJob]) -> List[AssetJob]:
+        """Expand jobs to every configured scale (unchanged when only 1x)"""
+        if self.scales == (1,):
+            return jobs
+        return [self.scale_job(job, factor) for job in jobs for factor in self.scales]
+    
+    def write_scale_manifest(self, jobs: List[AssetJob], outputs: Dict[str, bytes]):
+        """
+        Record the @Nx variants of each asset in scales.json
+        
+        Entries from earlier runs are kept, so partial builds update it in place.
+        
+        Args:
+            jobs: Scaled jobs that were built
+            outputs: Encoded bytes by output path
+        """
+        manifest_path = self.output_dir / "scales.json"
+        manifest = {"scales": [], "assets": {}}
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        
+        for job in jobs:
+            width, height = Image.open(io.BytesIO(outputs[job.path])).size
+            variants = manifest["assets"].setdefault(job.source_path, {})
+            variants[f"{job.scale}x"] = {"path": job.path, "width": width, "height": height}
+        manifest["scales"] = sorted(set(manifest["scales"]) | set(self.scales))
+        
+        write_if_changed(manifest_path,
+                         (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode())
+    
+    def frame_layout(self, job: AssetJob) -> Optional[Dict[str, Any]]:
+        """Frame grid of a strip job for the asset manifest (None for single images)"""
+        if job.method not in ("generate_tileset_sheet", "generate_terrain_tileset"):
+            return None
+        size = job.params["size"]
+        rows = len(TILE_STYLES) if job.method == "generate_terrain_tileset" else 1
+        return {"type": "grid", "frameWidth": size, "frameHeight": size,
+                "count": job.params["count"] * rows}
+    
+    def write_manifest(self):
+        """Refresh manifest.json from the files actually in output_dir"""
+        manifest_path, stats = update_manifest(self.output_dir, self.frame_layouts,
+                                               cache_dir=self.cache.cache_dir if self.cache else None)
+        print(f"\n📋 Manifest: {manifest_path} ({stats['assets']} assets, "
+              f"{stats['scanned']} rescanned, {stats['reused']} unchanged)")
+    
+    def build_catalogue(self, jobs: List[AssetJob]) -> Dict[str, bytes]:
+        """
+        Build catalogue jobs at every configured scale in one pass
+        
+        Args:
+            jobs: 1x jobs
+        
+        Returns:
+            Encoded bytes by output path
+        """
+        scaled_jobs = self.with_scales(jobs)
+        outputs = self.build_assets(scaled_jobs)
+        for job in scaled_jobs:
+            layout = self.frame_layout(job)
+            if layout:
+                self.frame_layouts[job.path] = layout
+        if self.scales != (1,):
+            self.write_scale_manifest(scaled_jobs, outputs)
+        return outputs
+    
+    def write_profile(self, prefix: str, top: int = 10):
+        """
+        Write the Chrome trace and per-stage timings, and print the slowest
+        
+        Args:
+            prefix: Output path prefix for .trace.json and .timings.json
+            top: Number of assets to list
+        """
+        events = self.tracer.drain()
+        summary = summarize_trace(events)
+        
+        trace_path = Path(f"{prefix}.trace.json")
+        timings_path = Path(f"{prefix}.timings.json")
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(trace_path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        with open(timings_path, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+        
+        total = sum(stage["ms"] for stage in summary["stages"].values()) or 1.0
+        print(f"\n⏱️  Profile ({len(events)} spans, {total:.1f} ms self time)")
+        print(f"   {'stage':<12} {'ms':>10} {'share':>7} {'count':>7}")
+        for name, stage in sorted(summary["stages"].items(), key=lambda item: -item[1]["ms"]):
+            print(f"   {name:<12} {stage['ms']:10.2f} {100 * stage['ms'] / total:6.1f}% {stage['count']:7d}")
+        
+        print(f"\n   Top {top} assets:")
+        slowest = sorted(summary["assets"].items(), key=lambda item: -item[1]["ms"])[:top]
+        for asset, timing in slowest:
+            stages = ", ".join(f"{name} {ms:.2f}" for name, ms in
+                               sorted(timing["stages"].items(), key=lambda item: -item[1]))
+            print(f"   {timing['ms']:9.2f} ms  {asset}  ({stages})")
+        
+        print(f"\n   Chrome trace: {trace_path} (open in chrome://tracing or Perfetto)")
+        print(f"   Timings: {timings_path}")
+    
+    def report(self):
+        """Print cache hit/miss and encoding statistics"""
+        if self.cache:
+            print(f"\n📦 Cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        stats = self.encode_stats
+        if self.indexed and stats["assets"]:
+            saved = stats["rgba_bytes"] - stats["bytes"]
+            print(f"🗜️  Indexed PNG: {stats['indexed']}/{stats['assets']} assets, "
+                  f"{stats['rgba_bytes'] / 1024:.1f}KB → {stats['bytes'] / 1024:.1f}KB "
+                  f"(saved {saved / 1024:.1f}KB, {100 * saved / stats['rgba_bytes']:.0f}%)")
+        if self.webp and stats["assets"]:
+            saved = stats["bytes"] - stats["smallest_bytes"]
+            print(f"🗜️  Lossless WebP: smaller for {stats['webp']}/{stats['assets']} assets, "
+                  f"{stats['bytes'] / 1024:.1f}KB → {stats['smallest_bytes'] / 1024:.1f}KB "
+                  f"(saved {saved / 1024:.1f}KB, {100 * saved / max(stats['bytes'], 1):.0f}%)")
+    
+    # ==================== ASSET CATALOGUE ====================
+    
+    def character_jobs(self) -> List[AssetJob]:
+        """Character sprite outputs"""
+        head = AssetJob("sprites/characters/head_krapovy.png", "generate_vityaz_head",
+                        "Head sprite generated", size=64)
+        torso = AssetJob("sprites/characters/torso_assault.png", "generate_vityaz_torso",
+                         "Torso sprite generated", size=64)
+        return [
+            head,
+            torso,
+            AssetJob("sprites/characters/vityaz_operator.png", "generate_vityaz_operator",
+                     "Full operator sprite generated", inputs=[head, torso], size=64),
+        ]
+    
+    def weapon_jobs(self) -> List[AssetJob]:
+        """Weapon sprite outputs, one per spec in asset-specs/weapons"""
+        jobs = []
+        for spec_id in self.spec_ids("weapons"):
+            spec = self.load_spec(spec_id)
+            jobs.append(AssetJob(f"sprites/{spec_id}.png", "render_spec",
+                                 f"{spec['label']} generated", spec=spec_id, size=spec["size"]))
+        return jobs
+    
+    def ui_jobs(self) -> List[AssetJob]:
+        """UI element outputs"""
+        return [
+            AssetJob("ui/vityaz_emblem.png", "generate_emblem",
+                     "Emblem generated", size=256),
+            AssetJob("ui/hud/health_bar.png", "generate_health_bar",
+                     "Health bar generated", width=200, height=20),
+            AssetJob("ui/hud/crosshair.png", "generate_crosshair",
+                     "Crosshair generated", size=32),
+        ]
+    
+    def tileset_jobs(self) -> List[AssetJob]:
+        """Tileset outputs: seeded variations per terrain plus a strip of all of them"""
+        jobs = []
+        for tile_type in TILE_STYLES:
+            jobs += [
+                AssetJob(f"maps/tilesets/tile_{tile_type}_{idx}.png", "generate_tile",
+                         f"{tile_type.capitalize()} tile {idx} generated",
+                         tile_type=tile_type, size=32, variant=idx, seed=self.tile_seed)
+                for idx in range(self.tile_variants)
+            ]
+            jobs.append(AssetJob(f"maps/tilesets/tileset_{tile_type}.png", "generate_tileset_sheet",
+                                 f"{tile_type.capitalize()} tileset strip generated",
+                                 tile_type=tile_type, count=self.tile_variants, size=32,
+                                 seed=self.tile_seed))
+        jobs.append(AssetJob("maps/tilesets/terrain.png", "generate_terrain_tileset",
+                             "Map terrain tileset generated",
+                             count=self.tile_variants, size=32, seed=self.tile_seed))
+        return jobs
+    
+    def effect_jobs(self) -> List[AssetJob]:
+        """Effect outputs"""
+        return [
+            AssetJob(f"effects/particles/muzzle_flash_{frame:02d}.png", "generate_muzzle_flash",
+                     f"Muzzle flash frame {frame} generated", frame_num=frame, size=16)
+            for frame in range(1, 4)
+        ]
+    
+    def atlas_jobs(self) -> List[AssetJob]:
+        """In-game sprites packed into the shared texture atlas"""
+        hud_jobs = [job for job in self.ui_jobs() if job.path.startswith("ui/hud/")]
+        return self.character_jobs() + self.weapon_jobs() + hud_jobs + self.effect_jobs()
+    
+    # ==================== GENERATION COMMANDS ====================
+    
+    def build_targets(self) -> Dict[str, Tuple[str, List[AssetJob], Optional[Tuple[str, Callable]]]]:
+        """
+        Named build targets
+        
+        Returns:
+            Target -> (heading, jobs it needs, (method, step run on their outputs) or None)
+        """
+        terrain = [job for job in self.tileset_jobs() if job.method == "generate_terrain_tileset"]
+        return {
+            "characters": ("🧑 Generating character sprites...", self.character_jobs(), None),
+            "weapons": ("🔫 Generating weapon sprites...", self.weapon_jobs(), None),
+            "ui": ("🖥️ Generating UI elements...", self.ui_jobs(), None),
+            "tilesets": ("🗺️ Generating tilesets...", self.tileset_jobs(), None),
+            "effects": ("✨ Generating effects...", self.effect_jobs(), None),
+            "atlas": ("🧩 Building atlas sprites...", self.atlas_jobs(),
+                      ("generate_atlas", self.generate_atlas)),
+            "animations": ("", [], ("generate_animations", lambda outputs: self.generate_animations())),
+            "maps": ("🗺️ Building map tileset...", terrain, ("generate_maps", lambda outputs: self.generate_maps())),
+        }
+    
+    def step_key(self, method: str, outputs: Dict[str, bytes]) -> str:
+        """Identity of a build step run: its code and the specs or catalogue outputs it reads"""
+        methods = [method]
+        if method == "generate_animations":
+            # Renderers are looked up by name at run time, so fingerprint() cannot follow them
+            methods += sorted({renderer for renderer, _ in ANIMATION_RENDERERS.values()})
+        digest = hashlib.sha256("".join(self.fingerprint(name) for name in methods).encode())
+        if method == "generate_animations":
+            # The rifle is drawn from its spec (generate_ak74m_sprite -> render_spec); like
+            # cache_key, cover spec contents and the palette, not just the code
+            material = {"palette": ColorPalette.values(),
+                        "specs": {spec_id: self.load_spec(spec_id) for spec_id in self.spec_ids("weapons")}}
+            digest.update(json.dumps(material, sort_keys=True).encode())
+        if method == "generate_atlas":
+            for path in sorted(outputs):
+                digest.update(path.encode())
+                digest.update(hashlib.sha256(outputs[path]).digest())
+        return digest.hexdigest()
+    
+    def build(self, targets: List[str], previous_steps: Optional[Dict[str, str]] = None) -> Dict[str, bytes]:
+        """
+        Build targets and everything they depend on, nothing else
+        
+        A target is a name from build_targets(), "all", or an output path
+        from the catalogue (with or without .png). Jobs shared by several
+        targets are built once, inputs only when a consumer missed the cache,
+        and every intermediate image is rendered once for the whole build.
+        
+        Args:
+            targets: Targets to build
+            previous_steps: step_keys of an earlier build with the same
+                options; steps whose key has not changed are skipped
+        
+        Returns:
+            Encoded bytes by output path
+        """
+        named = self.build_targets()
+        catalogue = {job.path: job for job in self.all_jobs()}
+        if "all" in targets:
+            targets = list(named)
+        
+        jobs: Dict[str, AssetJob] = {}
+        steps = []
+        for target in targets:
+            if target in named:
+                heading, target_jobs, step = named[target]
+                if heading and len(targets) == 1:
+                    print(f"\n{heading}")
+                jobs.update((job.path, job) for job in target_jobs)
+                if step is not None:
+                    steps.append(step)
+            elif target in catalogue or f"{target}.png" in catalogue:
+                job = catalogue.get(target) or catalogue[f"{target}.png"]
+                jobs[job.path] = job
+            else:
+                raise ValueError(f"Unknown build target '{target}' "
+                                 f"(targets: all, {', '.join(named)} or an asset path)")
+        
+        if len(targets) > 1 and jobs:
+            print(f"\n🎨 Building {len(jobs)} assets for {', '.join(targets)}...")
+        self._images = {}
+        outputs = self.build_catalogue(list(jobs.values())) if jobs else {}
+        for method, step in steps:
+            key = self.step_key(method, outputs)
+            if previous_steps and previous_steps.get(method) == key:
+                print(f"\n⏭️  {method}: unchanged")
+                continue
+            step(outputs)
+            self.step_keys[method] = key
+        return outputs
+    
+    def list_targets(self):
+        """Print build targets and the assets each builds"""
+        print("all")
+        for name, (_, jobs, step) in self.build_targets().items():
+            extra = " (+ sheets)" if name == "animations" else " (+ maps)" if name == "maps" else \
+                " (+ atlas pages)" if name == "atlas" else ""
+            print(f"{name}: {len(jobs)} assets{extra}")
+            for job in jobs:
+                print(f"  {job.path}")
+    
+    def generate_atlas(self, outputs: Dict[str, bytes]):
+        """
+        Pack built sprites into the shared Phaser atlas
+        
+        Args:
+            outputs: Encoded bytes by output path, from build_assets
+        """
+        print("\n🧩 Packing texture atlas...")
+        with self.batched_pages():
+            for factor in self.scales:
+                frames = {}
+                for job in self.atlas_jobs():
+                    name = Path(job.path).stem
+                    if name in frames:
+                        raise ValueError(f"Duplicate atlas frame name: {name}")
+                    if self.scales != (1,):
+                        job = self.scale_job(job, factor)
+                    frames[name] = Image.open(io.BytesIO(outputs[job.path]))
+                
+                suffix = f"@{factor}x" if self.scales != (1,) else ""
+                self.create_spritesheet(
+                    frames,
+                    str(self.output_dir / f"atlases/vityaz_sprites{suffix}.png"),
+                    padding=self.atlas_padding,
+                    max_size=self.atlas_max_size,
+                    scale=factor,
+                    trim=self.trim
+                )
     
     def generate_all(self):
         """Generate all graphics"""
@@ -636,11 +2519,14 @@ class AssetGenerator:
         print("🎨 VITYAZ GRAPHICS GENERATOR")
         print("="*50)
         
-        self.generate_character_sprites()
-        self.generate_weapon_sprites()
-        self.generate_ui_elements()
-        self.generate_tilesets()
-        self.generate_effects()
+        jobs = self.all_jobs()
+        print(f"\n🎨 Building {len(jobs)} assets at {', '.join(f'{f}x' for f in self.scales)} "
+              f"({self.jobs} worker{'s' if self.jobs > 1 else ''})...")
+        self._images = {}
+        outputs = self.build_catalogue(jobs)
+        self.generate_atlas(outputs)
+        self.generate_animations()
+        self.generate_maps()
         
         print("\n" + "="*50)
         print("🌟 Graphics generation complete!")
@@ -648,16 +2534,238 @@ class AssetGenerator:
         print(f"\n✅ Assets saved to: {self.output_dir}")
         print("\nNext steps:")
         print("1. Test assets in Phaser 3")
-        print("2. Create animation configurations")
+        print("2. Create animations from each sheet's meta.animation")
         print("3. Integrate with PreloadScene")
 
+# ==================== WATCH MODE ====================
+
+def reload_generator_module():
+    """Re-import the shared modules, then a fresh copy of this file"""
+    importlib.reload(asset_common)
+    importlib.reload(asset_manifest)
+    return asset_common.load_generator_module()
+
+
+def source_stamps(spec_dir: Path) -> Dict[str, int]:
+    """mtimes of everything a rebuild depends on: generator code and sprite specs"""
+    paths = [Path(__file__).resolve(), Path(asset_common.__file__).resolve(),
+             Path(asset_manifest.__file__).resolve()]
+    paths.extend(Path(spec_dir).rglob("*.json"))
+    stamps = {}
+    for path in paths:
+        with contextlib.suppress(OSError):
+            stamps[str(path)] = path.stat().st_mtime_ns
+    return stamps
+
+
+def wait_for_change(stamps: Dict[str, int], spec_dir: Path, interval: float) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Poll until a source changes, then until it settles (editors save in steps)
+    
+    Returns:
+        (new stamps, paths added, removed or modified)
+    """
+    current = stamps
+    while current == stamps:
+        time.sleep(interval)
+        current = source_stamps(spec_dir)
+    settled = None
+    while settled != current:
+        settled = current
+        time.sleep(interval)
+        current = source_stamps(spec_dir)
+    changed = sorted(path for path in set(stamps) | set(current) if stamps.get(path) != current.get(path))
+    return current, changed
+
+
+def notify_dev_server(url: str, changed: List[str], removed: List[str]) -> bool:
+    """POST changed asset paths to the dev server (see frontend/vite.config.ts)"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"changed": changed, "removed": removed}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=1):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def watch(options: Dict[str, Any], targets: List[str], notify_url: Optional[str], interval: float):
+    """
+    Rebuild targets whenever the generator code or a sprite spec changes
+    
+    The process stays warm between builds: each rebuild reloads this file,
+    hits the asset cache for everything whose fingerprint did not change and
+    skips atlas, animation and map steps whose inputs are unchanged. Files
+    are written atomically; the manifest is diffed to tell the dev server
+    which assets changed.
+    
+    Args:
+        options: AssetGenerator keyword arguments
+        targets: Build targets
+        notify_url: Dev server endpoint, or None to not notify
+        interval: Polling interval in seconds
+    """
+    spec_dir = Path(options["spec_dir"])
+    module = sys.modules[__name__]
+    stamps = source_stamps(spec_dir)
+    step_keys: Dict[str, str] = {}
+    
+    while True:
+        started = time.perf_counter()
+        generator = module.AssetGenerator(**options)
+        before = load_manifest(generator.output_dir)["assets"]
+        try:
+            generator.build(targets, step_keys)
+            generator.write_manifest()
+        except Exception:
+            traceback.print_exc()
+            print("\n❌ Build failed; fix the error and save again")
+        else:
+            after = load_manifest(generator.output_dir)["assets"]
+            changed = sorted(key for key, entry in after.items()
+                             if before.get(key, {}).get("sha256") != entry["sha256"])
+            removed = sorted(set(before) - set(after))
+            generator.report()
+            print(f"\n🔁 Rebuilt in {time.perf_counter() - started:.2f}s: "
+                  f"{len(changed)} changed, {len(removed)} removed")
+            if notify_url and (changed or removed) and not notify_dev_server(notify_url, changed, removed):
+                print(f"⚠️  Dev server not reachable at {notify_url}")
+        # Steps that ran now have new keys; failed ones rerun next time
+        step_keys.update(generator.step_keys)
+        
+        print(f"\n👀 Watching generator code and {spec_dir} (Ctrl+C to stop)...")
+        while True:
+            stamps, changed_sources = wait_for_change(stamps, spec_dir, interval)
+            print(f"\n✏️  Changed: {', '.join(Path(path).name for path in changed_sources)}")
+            if any(path.endswith('.py') for path in changed_sources):
+                try:
+                    module = reload_generator_module()
+                except Exception:
+                    traceback.print_exc()
+                    print("\n❌ Reload failed; fix the error and save again")
+                    continue
+            break
+
+
 def main():
     parser = argparse.ArgumentParser(description="VITYAZ Graphics Generator")
+    parser.add_argument(
+        'command',
+        nargs='*',
+        metavar='build TARGET',
+        help='Build only these targets and their inputs: all, a group (see --list-targets) '
+             'or an asset path'
+    )
+    parser.add_argument(
+        '--list-targets',
+        action='store_true',
+        help='List build targets and exit'
+    )
     parser.add_argument(
         '--output-dir',
         default='frontend/public/assets',
         help='Output directory for assets'
     )
+    parser.add_argument(
+        '--cache-dir',
+        default='.cache/graphics-generator',
+        help='Directory for the incremental build cache'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Render every asset even if it is already current'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Render assets across N worker processes'
+    )
+    parser.add_argument(
+        '--atlas-padding',
+        type=int,
+        default=2,
+        help='Transparent pixels between texture atlas frames'
+    )
+    parser.add_argument(
+        '--atlas-max-size',
+        type=int,
+        default=2048,
+        help='Maximum texture atlas page width/height'
+    )
+    parser.add_argument(
+        '--tile-variants',
+        type=int,
+        default=4,
+        help='Seeded variants rendered per terrain tile'
+    )
+    parser.add_argument(
+        '--tile-seed',
+        type=int,
+        default=0,
+        help='Base seed for tile variants'
+    )
+    parser.add_argument(
+        '--spec-dir',
+        default=str(SPEC_DIR),
+        help='Directory of declarative asset specs'
+    )
+    parser.add_argument(
+        '--no-indexed',
+        action='store_true',
+        help='Always write 32-bit RGBA PNGs instead of indexed PNGs where smaller'
+    )
+    parser.add_argument(
+        '--no-webp',
+        action='store_true',
+        help='Do not write lossless WebP alternates next to PNGs'
+    )
+    parser.add_argument(
+        '--scales',
+        default='1',
+        help='Comma-separated scale factors, e.g. 1,2,4 for @1x/@2x/@4x output'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='graphics-profile',
+        metavar='PREFIX',
+        help='Time every stage per asset; writes PREFIX.trace.json (Chrome trace) '
+             'and PREFIX.timings.json (default prefix: graphics-profile)'
+    )
+    parser.add_argument(
+        '--profile-top',
+        type=int,
+        default=10,
+        help='Number of slowest assets listed in the profile summary'
+    )
+    parser.add_argument(
+        '--no-trim',
+        action='store_true',
+        help='Pack atlas and animation frames untrimmed instead of cropping transparent borders'
+    )
+    parser.add_argument(
+        '--frame-tolerance',
+        type=int,
+        default=2,
+        help='Animation frames differing by at most this per channel are stored once (0 = exact only)'
+    )
+    parser.add_argument(
+        '--map-size',
+        default='128x128',
+        help='Size of generated maps in tiles, WIDTHxHEIGHT'
+    )
+    parser.add_argument(
+        '--map-chunk',
+        type=int,
+        default=16,
+        help='Map chunk side in tiles'
+    )
     parser.add_argument(
         '--generate-all',
         action='store_true',
@@ -678,20 +2786,91 @@ def main():
         action='store_true',
         help='Generate UI elements only'
     )
+    parser.add_argument(
+        '--generate-animations',
+        action='store_true',
+        help='Generate animation sheets only'
+    )
+    parser.add_argument(
+        '--generate-maps',
+        action='store_true',
+        help='Generate procedural maps only'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and rebuild the targets when the generator or a spec changes'
+    )
+    parser.add_argument(
+        '--notify-url',
+        default='http://localhost:3000/__vityaz/assets',
+        help="Dev server endpoint told about changed assets in --watch mode ('' to disable)"
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=0.2,
+        help='Seconds between --watch polls'
+    )
     
     args = parser.parse_args()
     
-    generator = AssetGenerator(args.output_dir)
+    options = dict(
+        output_dir=args.output_dir,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        jobs=args.jobs,
+        atlas_padding=args.atlas_padding,
+        atlas_max_size=args.atlas_max_size,
+        tile_variants=args.tile_variants,
+        tile_seed=args.tile_seed,
+        spec_dir=args.spec_dir,
+        indexed=not args.no_indexed,
+        scales=tuple(int(factor) for factor in args.scales.split(',')),
+        profile=args.profile is not None,
+        frame_tolerance=args.frame_tolerance,
+        trim=not args.no_trim,
+        map_size=tuple(int(side) for side in args.map_size.lower().split('x')),
+        map_chunk=args.map_chunk,
+        webp=not args.no_webp
+    )
+    generator = AssetGenerator(**options)
+    
+    if args.list_targets:
+        generator.list_targets()
+        return
     
-    if args.generate_all or (not any([args.generate_characters, args.generate_weapons, args.generate_ui])):
+    # The --generate-* flags are shorthands for build targets
+    targets = [target for flag, target in ((args.generate_characters, "characters"),
+                                           (args.generate_weapons, "weapons"),
+                                           (args.generate_ui, "ui"),
+                                           (args.generate_animations, "animations"),
+                                           (args.generate_maps, "maps")) if flag]
+    if args.command:
+        if args.command[0] != 'build':
+            parser.error(f"unknown command '{args.command[0]}' (expected: build TARGET...)")
+        targets += args.command[1:] or ["all"]
+    
+    if args.watch:
+        try:
+            watch(options, targets or ["all"], args.notify_url or None, args.watch_interval)
+        except KeyboardInterrupt:
+            print("\n👋 Watch stopped")
+        return
+    
+    if args.generate_all or not targets:
         generator.generate_all()
     else:
-        if args.generate_characters:
-            generator.generate_character_sprites()
-        if args.generate_weapons:
-            generator.generate_weapon_sprites()
-        if args.generate_ui:
-            generator.generate_ui_elements()
+        try:
+            generator.build(targets)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    
+    generator.write_manifest()
+    generator.report()
+    if args.profile:
+        generator.write_profile(args.profile, args.profile_top)
 
 if __name__ == '__main__':
     main()
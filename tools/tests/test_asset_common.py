@@ -0,0 +1,35 @@
+"""Tests for asset_common.py"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from asset_common import encode_png, quantize_indexed  # noqa: E402
+
+
+def test_indexed_png_round_trip_is_lossless():
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, (40, 4), dtype=np.uint8)
+    colors[:8, 3] = 255
+    colors[8:12, 3] = 0  # Transparent with stray colour
+    rgba = colors[rng.integers(0, len(colors), (48, 64))]
+
+    indexed = quantize_indexed(Image.fromarray(rgba, 'RGBA'))
+    assert indexed is not None and indexed.mode == 'P'
+    decoded = np.asarray(Image.open(io.BytesIO(encode_png(indexed))).convert('RGBA'))
+
+    expected = np.where(rgba[..., 3:] == 0, 0, rgba)
+    assert np.array_equal(decoded, expected)
+
+
+def test_quantize_indexed_refuses_too_many_colours():
+    rgba = np.zeros((16, 32, 4), dtype=np.uint8)
+    rgba[..., 0] = np.arange(512).reshape(16, 32) % 256
+    rgba[..., 1] = np.arange(512).reshape(16, 32) // 256
+    rgba[..., 3] = 255
+    assert quantize_indexed(Image.fromarray(rgba, 'RGBA')) is None
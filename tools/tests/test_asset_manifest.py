@@ -0,0 +1,48 @@
+"""Tests for asset_manifest.py"""
+
+import os
+import json
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from asset_manifest import update_manifest  # noqa: E402
+
+
+def test_manifest_depends_only_on_content(tmp_path):
+    manifests = []
+    for name, mtime in (("first", 1_000_000_000), ("second", 2_000_000_000)):
+        root = tmp_path / name
+        (root / "sprites").mkdir(parents=True)
+        Image.new('RGBA', (8, 4), (139, 21, 56, 255)).save(root / "sprites" / "head.png")
+        os.utime(root / "sprites" / "head.png", (mtime, mtime))
+        manifest_path, stats = update_manifest(str(root), cache_dir=str(tmp_path / "cache"))
+        assert stats == {"assets": 1, "scanned": 1, "reused": 0}
+        manifests.append(manifest_path.read_bytes())
+    assert manifests[0] == manifests[1]
+    assert b"mtime" not in manifests[0]
+
+
+def test_unchanged_files_are_reused_from_stat_cache(tmp_path):
+    Image.new('RGBA', (8, 4)).save(tmp_path / "tile.png")
+    cache_dir = str(tmp_path / ".cache")
+    update_manifest(str(tmp_path), cache_dir=cache_dir)
+    _, stats = update_manifest(str(tmp_path), cache_dir=cache_dir)
+    assert stats["reused"] == 1 and stats["scanned"] == 0
+
+    Image.new('RGBA', (8, 8)).save(tmp_path / "tile.png")
+    _, stats = update_manifest(str(tmp_path), cache_dir=cache_dir)
+    assert stats["scanned"] == 1
+
+
+def test_grid_layouts_survive_rescans_without_layouts(tmp_path):
+    Image.new('RGBA', (32, 8)).save(tmp_path / "tileset_grass.png")
+    grid = {"type": "grid", "frameWidth": 8, "frameHeight": 8, "count": 4}
+    update_manifest(str(tmp_path), {"tileset_grass.png": grid}, cache_dir=None)
+    # Standalone CLI run: no layouts, no stat cache
+    manifest_path, stats = update_manifest(str(tmp_path), cache_dir=None)
+    assert stats["scanned"] == 1
+    assert json.loads(manifest_path.read_text())["assets"]["tileset_grass.png"]["frames"] == grid
@@ -0,0 +1,145 @@
+"""Tests for generate_sprites.py"""
+
+import sys
+import json
+import socket
+import threading
+import socketserver
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generate_sprites import (PromptEmbeddingCache, SpriteWorkerHandler,  # noqa: E402
+                              VityazSpriteGenerator, parse_address)
+
+
+def stand_in_prompts() -> dict:
+    """A few small prompts over two canvas sizes, quick to render with the stand-in"""
+    return {
+        f"weapons/test_{idx}": {"prompt": f"test rifle number {idx}, pixel art",
+                                "size": (96, 96) if idx % 2 else (128, 64), "resize": (32, 32)}
+        for idx in range(5)
+    }
+
+
+def stand_in_generator(root: Path, **kwargs) -> VityazSpriteGenerator:
+    generator = VityazSpriteGenerator(str(root / "sprites"), embedding_cache_dir=str(root / "cache"),
+                                      **kwargs)
+    generator.initialize_model(stand_in=True)
+    return generator
+
+
+def sprite_bytes(root: Path) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob("*")) if path.suffix in (".png", ".webp")}
+
+
+def worker_events(tmp_path: Path, request: dict):
+    """Send one request to a worker on a Unix socket and return every event"""
+    generator = VityazSpriteGenerator(str(tmp_path / "sprites"))
+    server = socketserver.ThreadingUnixStreamServer(str(tmp_path / "worker.sock"), SpriteWorkerHandler)
+    server.generator = generator
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX) as conn:
+            conn.connect(str(tmp_path / "worker.sock"))
+            with conn.makefile("rwb") as stream:
+                stream.write((json.dumps(request) + "\n").encode())
+                stream.flush()
+                return [json.loads(line) for line in stream]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_worker_rejects_names_outside_output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    escape = "../../../tmp/gs/escape"
+    config = dict(VityazSpriteGenerator.get_prompts()["weapons/ak74m"])
+    events = worker_events(tmp_path, {"sprites": {escape: config}})
+
+    assert [event["event"] for event in events] == ["done"]
+    assert "escape" in events[0]["error"]
+    assert not (tmp_path / "sprites" / f"{escape}.png").resolve().exists()
+
+
+def test_worker_answers_bad_configs_with_done(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    events = worker_events(tmp_path, {"sprites": {"weapons/svd": {"prompt": "rifle"}}})
+    assert [event["event"] for event in events] == ["done"]
+    assert "size" in events[0]["error"]
+
+def test_embedding_cache_adopts_files_of_an_interrupted_run(tmp_path):
+    cache = PromptEmbeddingCache(str(tmp_path), model_id="stand-in", max_bytes=10 ** 6)
+    cache.put("first prompt", np.zeros(16))
+    (tmp_path / "index.json").unlink()  # Killed before the index was written
+    (tmp_path / f"{'0' * 64}.pkl").write_bytes(b"orphan")
+
+    reopened = PromptEmbeddingCache(str(tmp_path), model_id="stand-in", max_bytes=10 ** 6)
+    assert reopened.get("first prompt") is not None
+    assert "0" * 64 in reopened.index
+    reopened.max_bytes = 0
+    reopened.save()
+    assert not list(tmp_path.glob("*.pkl"))
+
+
+def test_worker_only_listens_on_loopback():
+    assert parse_address("127.0.0.1:8765") == (socket.AF_INET, ("127.0.0.1", 8765))
+    assert parse_address(":8765")[1] == ("127.0.0.1", 8765)
+    for address in ("0.0.0.0:8765", "192.168.1.5:8765", "example.com:8765"):
+        with pytest.raises(ValueError):
+            parse_address(address)
+
+
+def test_batched_output_matches_one_sprite_per_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    outputs = {}
+    for batch_size in (4, 1):
+        root = tmp_path / f"batch{batch_size}"
+        generator = stand_in_generator(root, max_batch_size=batch_size)
+        events = list(generator.iter_generate(stand_in_prompts()))
+        assert [event["event"] for event in events] == ["sprite"] * 5
+        outputs[batch_size] = sprite_bytes(root / "sprites")
+    assert len(outputs[4]) >= 5
+    assert outputs[4] == outputs[1]
+
+
+def test_manifest_resume_skips_finished_sprites(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    prompts = stand_in_prompts()
+    first = stand_in_generator(tmp_path)
+    assert {event["event"] for event in first.iter_generate(prompts)} == {"sprite"}
+    before = sprite_bytes(tmp_path / "sprites")
+
+    prompts["weapons/test_1"]["prompt"] += ", scoped"
+    (tmp_path / "sprites" / "weapons" / "test_2.png").unlink()
+    events = {event["name"]: event["event"]
+              for event in stand_in_generator(tmp_path).iter_generate(prompts)}
+    assert events == {"weapons/test_0": "skipped", "weapons/test_1": "sprite",
+                      "weapons/test_2": "sprite", "weapons/test_3": "skipped",
+                      "weapons/test_4": "skipped"}
+    after = sprite_bytes(tmp_path / "sprites")
+    assert after["weapons/test_2.png"] == before["weapons/test_2.png"]
+    assert after["weapons/test_1.png"] != before["weapons/test_1.png"]
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    cache = PromptEmbeddingCache(str(tmp_path), model_id="stand-in", max_bytes=10 ** 6)
+    for text in ("first", "second", "third"):
+        cache.put(text, np.zeros(1000))
+    entry_bytes = cache.index[cache.key("first")]["bytes"]
+    for used, text in enumerate(("second", "first", "third")):
+        cache.index[cache.key(text)]["used"] = used  # "second" is the oldest
+
+    cache.max_bytes = 2 * entry_bytes
+    cache.save()
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
+    assert not (tmp_path / f"{cache.key('second')}.pkl").exists()
+
+    reopened = PromptEmbeddingCache(str(tmp_path), model_id="stand-in", max_bytes=2 * entry_bytes)
+    assert set(reopened.index) == {cache.key("first"), cache.key("third")}
@@ -0,0 +1,190 @@
+"""Tests for graphics-generator.py (run from the repository root: python3 -m pytest tools/tests)"""
+
+import sys
+import json
+import time
+import base64
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+TOOLS_DIR = Path(__file__).resolve().parents[1]
+GENERATOR = TOOLS_DIR / "graphics-generator.py"
+
+
+def run_generator(tmp_path: Path, name: str, *args: str) -> Path:
+    """Run the generator CLI into tmp_path/name and return its output directory"""
+    output_dir = tmp_path / name / "assets"
+    subprocess.run(
+        [sys.executable, str(GENERATOR), "--output-dir", str(output_dir),
+         "--cache-dir", str(tmp_path / name / "cache"), *args],
+        check=True, capture_output=True, text=True
+    )
+    return output_dir
+
+
+def tree_bytes(root: Path):
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob("*")) if path.is_file()}
+
+
+def test_parallel_build_without_profile_matches_serial(tmp_path):
+    serial = run_generator(tmp_path, "serial", "build", "characters", "weapons", "ui")
+    parallel = run_generator(tmp_path, "parallel", "-j", "2", "build", "characters", "weapons", "ui")
+    assert tree_bytes(parallel) == tree_bytes(serial)
+
+
+def test_scaled_variants_keep_1x_proportions(tmp_path):
+    sys.path.insert(0, str(TOOLS_DIR))
+    from asset_common import load_generator_module
+
+    generator = load_generator_module().AssetGenerator(str(tmp_path), cache_dir=None)
+    jobs = {job.method: job for job in generator.ui_jobs() + generator.character_jobs()
+            + generator.tileset_jobs()}
+    limits = {"generate_health_bar": 0, "generate_tile": 0, "generate_crosshair": 0.01,
+              "generate_emblem": 0.02, "generate_vityaz_head": 0.03}
+    for method, limit in limits.items():
+        base = np.asarray(generator.node_image(method, **jobs[method].params)).astype(int)
+        for factor in (2, 4):
+            job = generator.scale_job(jobs[method], factor)
+            scaled = np.asarray(generator.node_image(method, **job.params)).astype(int)
+            # Centre pixel of each factor x factor block against the 1x pixel
+            sampled = scaled[factor // 2::factor, factor // 2::factor]
+            assert (np.abs(sampled - base).max(-1) > 40).mean() <= limit, (method, factor)
+
+    # Operator poses are drawn at 1x and enlarged; flashes are resolution-free polygons
+    animation_limits = {"player_walk": 0, "player_run": 0, "player_shoot": 0, "muzzle_flash": 0.1}
+    for name, limit in animation_limits.items():
+        base = [np.asarray(frame.convert('RGBA')).astype(int) for frame in generator.render_animation(name)]
+        for factor in (2, 4):
+            for frame, base_frame in zip(generator.render_animation(name, factor), base):
+                sampled = np.asarray(frame.convert('RGBA')).astype(int)[factor // 2::factor, factor // 2::factor]
+                assert (np.abs(sampled - base_frame).max(-1) > 40).mean() <= limit, (name, factor)
+
+
+def test_map_chunks_are_uncompressed_base64(tmp_path):
+    output_dir = run_generator(tmp_path, "maps", "--generate-maps", "--map-size", "40x24")
+    document = json.loads((output_dir / "maps" / "forest.json").read_text())
+    layer = document["layers"][0]
+    # Phaser 3 skips layers with a "compression" key
+    assert layer["encoding"] == "base64" and "compression" not in layer
+    for chunk in layer["chunks"]:
+        gids = np.frombuffer(base64.b64decode(chunk["data"]), '<u4')
+        plain = json.loads((output_dir / "maps" / "forest" / f"{chunk['x']}_{chunk['y']}.json").read_text())
+        assert gids.tolist() == plain["data"]
+        assert len(gids) == chunk["width"] * chunk["height"]
+
+
+def test_map_tileset_image_exists_with_scales(tmp_path):
+    output_dir = run_generator(tmp_path, "maps", "--scales", "1,2", "--generate-maps", "--map-size", "16x16")
+    document = json.loads((output_dir / "maps" / "default.json").read_text())
+    tileset = document["tilesets"][0]
+    assert (output_dir / "maps" / tileset["image"]).exists()
+    assert document["tilewidth"] == tileset["tilewidth"] == 32
+
+
+def test_watch_rebuilds_animations_when_a_weapon_spec_changes(tmp_path):
+    spec_dir = tmp_path / "asset-specs"
+    shutil.copytree(TOOLS_DIR / "asset-specs", spec_dir)
+    sheet = tmp_path / "assets" / "sprites" / "characters" / "player_shoot.png"
+    process = subprocess.Popen(
+        [sys.executable, str(GENERATOR), "--output-dir", str(tmp_path / "assets"),
+         "--cache-dir", str(tmp_path / "cache"), "--spec-dir", str(spec_dir),
+         "--watch", "--watch-interval", "0.1", "build", "animations"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        before = wait_for(lambda: sheet.exists() and (tmp_path / "assets" / "manifest.json").exists()
+                          and sheet.read_bytes())
+        spec_path = spec_dir / "weapons" / "ak74m.json"
+        spec = json.loads(spec_path.read_text())
+        spec["colors"]["stock_wood"] = [200, 30, 30]
+        spec_path.write_text(json.dumps(spec))
+        after = wait_for(lambda: sheet.read_bytes() != before and sheet.read_bytes())
+    finally:
+        process.terminate()
+        process.wait()
+    assert after != before
+
+
+def wait_for(condition, timeout: float = 60):
+    """Poll condition until it returns something truthy"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def test_reloaded_module_renders_serially_without_fork(tmp_path, monkeypatch):
+    import multiprocessing
+    sys.path.insert(0, str(TOOLS_DIR))
+    from asset_common import load_generator_module
+
+    module = load_generator_module()
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    monkeypatch.setattr(multiprocessing, "get_context", lambda method=None: pytest.fail(method))
+    generator = module.AssetGenerator(str(tmp_path), cache_dir=None, jobs=2)
+    jobs = generator.ui_jobs()
+    assert len(generator.render_jobs(jobs)) == len(jobs)
+
+
+def test_maxrects_pages_do_not_overlap():
+    sys.path.insert(0, str(TOOLS_DIR))
+    from asset_common import load_generator_module
+
+    rng = np.random.default_rng(0)
+    rects = [(f"r{idx}", int(w), int(h)) for idx, (w, h) in enumerate(rng.integers(4, 120, (200, 2)))]
+    pages = load_generator_module().plan_atlas_pages(rects, max_size=256)
+    assert len(pages) > 1
+    sizes = {name: (w, h) for name, w, h in rects}
+    assert sorted(name for _, placements in pages for name in placements) == sorted(sizes)
+    for (page_w, page_h), placements in pages:
+        used = np.zeros((page_h, page_w), dtype=int)
+        for name, (x, y) in placements.items():
+            w, h = sizes[name]
+            assert x + w <= page_w and y + h <= page_h, name
+            used[y:y + h, x:x + w] += 1
+        assert used.max() == 1
+
+
+def test_spritesheet_dedupes_frames_and_records_trim_offsets(tmp_path):
+    from PIL import Image
+    sys.path.insert(0, str(TOOLS_DIR))
+    from asset_common import load_generator_module
+
+    module = load_generator_module()
+    dot = Image.new('RGBA', (32, 32), (0, 0, 0, 0))
+    dot.paste((200, 40, 40, 255), (10, 12, 14, 20))
+    moved = Image.new('RGBA', (32, 32), (0, 0, 0, 0))
+    moved.paste((200, 40, 40, 255), (20, 4, 24, 12))
+    other = Image.new('RGBA', (32, 32), (0, 0, 0, 0))
+    other.paste((40, 200, 40, 255), (10, 12, 14, 20))
+    frames = {"a": dot, "b": dot.copy(), "c": moved, "d": other}
+
+    unique, mapping = module.dedupe_frames([np.asarray(frame) for frame in frames.values()])
+    assert unique == [0, 2, 3] and mapping == [0, 0, 2, 3]
+
+    generator = module.AssetGenerator(str(tmp_path), cache_dir=None)
+    generator.create_spritesheet(frames, str(tmp_path / "sheet.png"))
+    atlas = json.loads((tmp_path / "sheet.json").read_text())["frames"]
+    # Same pixels once trimmed: one packed rect, told apart by the offset
+    assert atlas["a"]["frame"] == atlas["b"]["frame"] == atlas["c"]["frame"]
+    assert atlas["a"]["frame"] != atlas["d"]["frame"]
+    assert atlas["a"]["spriteSourceSize"] == {"x": 10, "y": 12, "w": 4, "h": 8}
+    assert atlas["c"]["spriteSourceSize"] == {"x": 20, "y": 4, "w": 4, "h": 8}
+    assert all(entry["sourceSize"] == {"w": 32, "h": 32} and entry["trimmed"] for entry in atlas.values())
+
+    # Cropping each frame back into its source rect restores the original
+    page = Image.open(tmp_path / "sheet.png").convert('RGBA')
+    for name, frame in frames.items():
+        rect, offset = atlas[name]["frame"], atlas[name]["spriteSourceSize"]
+        restored = Image.new('RGBA', (32, 32), (0, 0, 0, 0))
+        restored.paste(page.crop((rect["x"], rect["y"], rect["x"] + rect["w"], rect["y"] + rect["h"])),
+                       (offset["x"], offset["y"]))
+        assert np.array_equal(np.asarray(restored), np.asarray(frame)), name